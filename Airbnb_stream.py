@@ -1,13 +1,27 @@
+import json
+import math
+import os
+import time
+import uuid
+from contextlib import nullcontext
+
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import folium_static
-from folium import IFrame
-from folium.plugins import HeatMap
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
+
+from airbnb_profile import PageProfile
+from airbnb_warmup import WARMUP_ENABLED, start_warmup, warmup_status
+
+# Each page imports its own data, plotting and mapping stack on first use, so
+# opening the app (or only the intro page) does not pay for pandas, seaborn,
+# matplotlib, plotly or folium. With profiling on, the cost shows up as the
+# page's 'import' phase.
+
+def phase(name, detail=''):
+
+    # Time a block of the current page when profiling is switched on in the sidebar
+    profile = st.session_state.get('page_profile')
+    if profile is None:
+        return nullcontext({})
+    return profile.phase(name, detail)
 
 def set_gradient_bg():
 
@@ -68,368 +82,571 @@ def intro_page():
     st.markdown("<p style='text-align: right; font-size: 16px;color: #ffffff;margin-bottom: 0px; '>Submitted by</p>", unsafe_allow_html=True)
     st.markdown("<p style='text-align: right;color: #ffffff; font-size: 18px;'><b>N. Senthamizh Priya</b></p>", unsafe_allow_html=True)
 
+# Listings drawn on the marker map before a stratified sample is taken instead
+MAP_POINT_BUDGET = int(os.environ.get('AIRBNB_MAP_POINT_BUDGET', 5000))
+
+# The most markers a user can ask for, however many listings match
+MAP_POINT_LIMIT = max(int(os.environ.get('AIRBNB_MAP_POINT_LIMIT', MAP_POINT_BUDGET * 10)), MAP_POINT_BUDGET)
+
+# Points in the host scatter before it is sampled the same way
+SCATTER_POINT_BUDGET = int(os.environ.get('AIRBNB_SCATTER_POINT_BUDGET', 2000))
+
+# Popup text columns are shipped once as lookup tables, rows only carry their codes
+POPUP_LOOKUPS = ['Country', 'City', 'Suburb', 'Room type']
+
+MARKER_CALLBACK = """(function () {
+    var lookups = %s;
+    function esc(value) {
+        return String(value).replace(/[&<>"']/g, function (c) { return '&#' + c.charCodeAt(0) + ';'; });
+    }
+    function rating(value) {
+        return Number.isInteger(value) ? value.toFixed(1) : String(value);
+    }
+    return function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]));
+        // The popup HTML is only built when a marker is clicked
+        marker.bindPopup(function () {
+            return '<b>Country:</b> ' + esc(lookups[0][row[2]]) + '<br>' +
+                '<b>City:</b> ' + esc(lookups[1][row[3]]) + '<br>' +
+                '<b>Suburb:</b> ' + esc(lookups[2][row[4]]) + '<br>' +
+                '<b>Price:</b> ' + esc(row[6]) + '<br>' +
+                '<b>Rating:</b> ' + esc(rating(row[7])) + '<br>' +
+                '<b>Room type:</b> ' + esc(lookups[3][row[5]]) + '<br>';
+        }, {maxWidth: 200});
+        return marker;
+    };
+})()"""
+
+def listing_marker_layer(listings_df):
+
+    import pandas as pd
+    from folium.plugins import FastMarkerCluster
+
+    # One clustered layer with a compact row per listing:
+    # [Longitude, Latitude, country, city, suburb, room type, price, rating]
+    listings_df = listings_df.dropna(subset=['Longitude', 'Latitude'])
+    compact = listings_df[['Longitude', 'Latitude']].astype(float)
+
+    lookups = []
+    for column in POPUP_LOOKUPS:
+        codes, values = pd.factorize(listings_df[column])
+        # factorize marks missing values as -1, point them at a trailing ''
+        codes[codes < 0] = len(values)
+        compact[column] = codes
+        lookups.append([str(value) for value in values] + [''])
+
+    compact['Price'] = listings_df['Price']
+    compact['Rating'] = listings_df['Rating']
+
+    data = compact.astype(object).where(compact.notna(), '').values.tolist()
+    callback = MARKER_CALLBACK % json.dumps(lookups).replace('</', '<\\/')
+
+    return FastMarkerCluster(data, callback=callback)
+
+def map_bounds(bounds):
+
+    # st_folium reports Leaflet bounds; the markers are placed at [Longitude, Latitude]
+    # as [lat, lng], so the viewport's lat range applies to the Longitude column
+    if not bounds or not bounds.get('_southWest') or not bounds.get('_northEast'):
+        return None
+    south, west = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+    north, east = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+    if None in (south, west, north, east) or east - west >= 360:
+        return None
+    return (south, west), (north, east)
+
+def map_center(center):
+    return (center['lat'], center['lng']) if center else None
+
 def Geospatial_visualisation_page():
 
-    Geospatial_df = pd.read_csv('Geospatial_data.csv')
+    with phase('import', 'pandas, folium'):
+        import folium
+        from folium.plugins import HeatMap
+        from streamlit_folium import folium_static, st_folium
+
+        from airbnb_data import dataset_version
+        from airbnb_index import HEAT_LEVELS, bin_points, filter_index, heat_cells, heat_pyramid
+        from airbnb_sampling import sampled_view, sampling_note
+
+    with phase('load', 'Geospatial filter index') as record:
+        index = filter_index()
+        record['rows'] = len(index.df)
 
-    countries = Geospatial_df['Country'].unique()
-    selected_countries = st.multiselect('Select countries', countries, default=[])
+    # Whole-number widget bounds that still cover every listing, so the default
+    # selection keeps the most expensive one and counts as the full range
+    min_price_bound, max_price_bound = math.floor(index.price_bounds[0]), math.ceil(index.price_bounds[1])
+    min_rating_bound, max_rating_bound = math.floor(index.rating_bounds[0]), math.ceil(index.rating_bounds[1])
 
-    Room_type = Geospatial_df['Room type'].unique()
-    selected_Room_type = st.multiselect('Select Room type', Room_type, default=[])
+    selected_countries = st.multiselect('Select countries', index.countries, default=[])
+
+    selected_Room_type = st.multiselect('Select Room type', index.room_types, default=[])
 
     col1, col2 = st.columns(2)
 
     with col1:
         min_price = st.number_input(
             'Minimum price', 
-            min_value=int(Geospatial_df['Price'].min()), 
-            max_value=int(Geospatial_df['Price'].max()), 
-            value=int(Geospatial_df['Price'].min())
+            min_value=min_price_bound, 
+            max_value=max_price_bound, 
+            value=min_price_bound
         )
 
     with col2:
         max_price = st.number_input(
             'Maximum price', 
-            min_value=int(Geospatial_df['Price'].min()), 
-            max_value=int(Geospatial_df['Price'].max()), 
-            value=int(Geospatial_df['Price'].max())
+            min_value=min_price_bound, 
+            max_value=max_price_bound, 
+            value=max_price_bound
         )
 
     min_rating, max_rating = st.slider(
         'Select rating range',
-        min_value=int(Geospatial_df['Rating'].min()),
-        max_value=int(Geospatial_df['Rating'].max()),
-        value=(int(Geospatial_df['Rating'].min()), int(Geospatial_df['Rating'].max()))
+        min_value=min_rating_bound,
+        max_value=max_rating_bound,
+        value=(min_rating_bound, max_rating_bound)
     )
 
-    if not selected_Room_type:
-        filtered_df = Geospatial_df[
-            (Geospatial_df['Country'].isin(selected_countries)) &
-            (Geospatial_df['Price'] >= min_price) &
-            (Geospatial_df['Price'] <= max_price) &
-            (Geospatial_df['Rating'] >= min_rating) &
-            (Geospatial_df['Rating'] <= max_rating)
-        ]
-    else:
-        filtered_df = Geospatial_df[
-            (Geospatial_df['Country'].isin(selected_countries)) &
-            (Geospatial_df['Room type'].isin(selected_Room_type)) &
-            (Geospatial_df['Price'] >= min_price) &
-            (Geospatial_df['Price'] <= max_price) &
-            (Geospatial_df['Rating'] >= min_rating) &
-            (Geospatial_df['Rating'] <= max_rating)
-        ]
+    # An empty room type selection keeps every room type
+    with phase('filter', 'listings') as record:
+        filtered_df = index.filter(selected_countries, selected_Room_type, (min_price, max_price), (min_rating, max_rating))
+        record['rows'] = len(filtered_df)
     
-    map = folium.Map(location=[0, 0], zoom_start=2)
-
-    for _, row in filtered_df.iterrows():
-
-        formatted_rating = f"{float(row['Rating'])}"
-        
-        html = f"""
-        <b>Country:</b> {row['Country']}<br>
-        <b>City:</b> {row['City']}<br>
-        <b>Suburb:</b> {row['Suburb']}<br>
-        <b>Price:</b> {row['Price']}<br>
-        <b>Rating:</b> {formatted_rating}<br>
-        <b>Room type:</b> {row['Room type']}<br>
-        """
-        iframe = IFrame(html, width=200, height=150)
-        popup = folium.Popup(iframe, max_width=200)
-        
-        folium.Marker(
-            location=[row['Longitude'], row['Latitude']],  
-            popup=popup
-        ).add_to(map)
+    point_budget = st.number_input(
+        'Maximum markers on the map',
+        min_value=100,
+        max_value=MAP_POINT_LIMIT,
+        value=MAP_POINT_BUDGET,
+        step=1000
+    )
+    # The widget's bounds are a browser hint; hold the cap here as well
+    point_budget = min(int(point_budget), MAP_POINT_LIMIT)
 
-    map_with_heatmap = folium.Map(location=[0, 0], zoom_start=2)
-    heat_data = [[row['Longitude'], row['Latitude']] for index, row in filtered_df.iterrows()]
-    HeatMap(heat_data).add_to(map_with_heatmap)
+    heat_level = st.select_slider('Heatmap detail', options=HEAT_LEVELS, value=8)
+    heat_weight = st.radio('Heatmap weight', ['Listings', 'Average price'], horizontal=True)
 
+    # The maps stay open while the user pans and zooms, which reruns the page
     if st.button('Display Map'):
-        st.subheader("Map with Markers")
-        folium_static(map)
-        
-        st.subheader("Listings Heatmap")
+        st.session_state['show_map'] = True
+    if not st.session_state.get('show_map'):
+        return
+    if st.button('Hide Map'):
+        st.session_state['show_map'] = False
+        return
+
+    # Markers only cover the area the map reported on its last move; until then
+    # (or when the whole world is in view) every filtered listing is a candidate
+    viewport = st.session_state.get('listing_map') or {}
+    bounds = map_bounds(viewport.get('bounds'))
+
+    # Above the budget the markers are a stratified sample, kept per filter state and viewport
+    filters = (tuple(selected_countries), tuple(selected_Room_type), (min_price, max_price), (min_rating, max_rating))
+    sample_key = ('map', dataset_version('Geospatial')) + filters + (bounds, point_budget)
+    with phase('filter', 'viewport') as record:
+        marker_df, in_view = sampled_view(
+            sample_key, lambda: filtered_df if bounds is None else index.filter(*filters, bounds), point_budget)
+        record['rows'] = in_view
+    charge_session('Geospatial Visualisation', 'sample', sample_key, marker_df)
+
+    where = "listings in view" if bounds is not None else "listings"
+    if len(marker_df) < in_view:
+        st.caption(sampling_note(len(marker_df), in_view, where) +
+                   " Raise the marker budget or zoom in to see more.")
+    else:
+        st.caption(f"Showing all {in_view:,} {where}.")
+
+    with phase('draw', 'marker layer') as record:
+        markers = folium.FeatureGroup(name='Listings')
+        listing_marker_layer(marker_df).add_to(markers)
+        record['rows'] = len(marker_df)
+
+    # The heatmap ships one weighted point per grid cell instead of every listing.
+    # Without a narrowed price/rating range the cells come from the prebuilt pyramid.
+    full_range = (
+        min_price <= min_price_bound and max_price >= max_price_bound and
+        min_rating <= min_rating_bound and max_rating >= max_rating_bound
+    )
+    with phase('aggregate', 'heatmap cells') as record:
+        if full_range:
+            cells = heat_cells(heat_pyramid()[heat_level], heat_level, selected_countries, selected_Room_type)
+        else:
+            cells = heat_cells(bin_points(filtered_df, heat_level), heat_level)
+        record['rows'] = len(cells)
+
+    weight = cells['Count'] if heat_weight == 'Listings' else cells['Mean price']
+    cells = cells.assign(Weight=weight / weight.max()).dropna(subset=['Weight'])
+
+    map_with_heatmap = folium.Map(location=[0, 0], zoom_start=2)
+    HeatMap(cells[['Longitude', 'Latitude', 'Weight']].values.tolist()).add_to(map_with_heatmap)
+
+    st.subheader("Map with Markers")
+    with phase('serialise', 'marker map'):
+        # The base map never changes, so st_folium keeps it mounted and only
+        # swaps the marker layer when the viewport or the filters change
+        st_folium(
+            folium.Map(location=[0, 0], zoom_start=2),
+            key='listing_map',
+            center=map_center(viewport.get('center')),
+            zoom=viewport.get('zoom'),
+            feature_group_to_add=markers,
+            returned_objects=['bounds', 'zoom', 'center'],
+            height=500,
+            use_container_width=True,
+        )
+
+    st.subheader("Listings Heatmap")
+    with phase('serialise', 'heatmap'):
         folium_static(map_with_heatmap)
 
-def Room_Property_Pricing():
+# Where the bar, box and scatter charts are drawn: matplotlib PNGs from the
+# server, or Plotly figures whose data the browser draws
+CHART_BACKENDS = ['Server images', 'Browser (Plotly)']
+DEFAULT_CHART_BACKEND = 'Browser (Plotly)' if os.environ.get('AIRBNB_CHART_BACKEND') == 'plotly' else 'Server images'
 
-    Price_df = pd.read_csv('Price_data.csv')
+def browser_charts():
+    return st.session_state.get('chart_backend', DEFAULT_CHART_BACKEND) == 'Browser (Plotly)'
 
-    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Country-wise Price Trends: Room and Property Type Insights</h1>", unsafe_allow_html=True)
+def chart_builders():
 
-    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
+    # Both modules offer the same builders with the same arguments
+    if browser_charts():
+        import airbnb_webcharts as charts
+    else:
+        import airbnb_charts as charts
+    return charts
 
-    col1, col2 = st.columns(2)
+def show_figure(key, dataset, draw):
 
-    with col1:
+    if browser_charts():
+        # Only the chart's table goes out; building the figure is cheap, so it is not cached
+        with phase('draw', key[1]):
+            fig = draw()
+        with phase('serialise', key[1]):
+            st.plotly_chart(fig, width='stretch')
+        return
 
-            room_type = st.selectbox("Select Room type", Price_df['Room type'].unique())
+    from airbnb_charts import render_png
+    from airbnb_data import dataset_version
 
-            # Filter data based on selected property type
-            filtered_room_data = Price_df[Price_df['Room type'] == room_type]
+    # Reuse the rendered image while the selection and the dataset are unchanged
+    key = key + (dataset_version(dataset),)
+    with phase('draw', key[1]):
+        image = render_png(key, draw)
+        st.image(image)
+    charge_session(key[0], 'figure', key, image)
 
-            # Compute mean prices for each country for the selected property type
-            mean_prices = filtered_room_data.groupby('Country')['Price'].mean().reset_index()
+def session_id():
+    return st.session_state.setdefault('session_id', uuid.uuid4().hex[:12])
 
-            # Create a bar plot
-            st.subheader(f"Prices of {room_type}")
-            fig3, ax = plt.subplots()
+def charge_session(page, cache, key, artefact):
 
-            sns.barplot(x='Country', y='Price', data=mean_prices, ax=ax,color='#FF5A5F')
+    from airbnb_memory import ledger
 
-            # Customize font sizes
-            ax.set_title(f"Prices of {room_type}", fontsize=12)
-            ax.set_xlabel("Country", fontsize=10)
-            ax.set_ylabel("Average Price", fontsize=10)
-            ax.tick_params(axis='both', which='major', labelsize=8)
-            plt.xticks(rotation=45, ha='right', fontsize=10)
-            plt.yticks(fontsize=8)
+    # Count a shared cache entry against this session's memory budget
+    size = len(artefact) if isinstance(artefact, bytes) else int(artefact.memory_usage(deep=True).sum())
+    ledger.charge(session_id(), page, cache, key, size)
 
-            # Display the plot
+def note_panel_run(panel):
 
-            st.pyplot(fig3)
+    # Count every run of a panel so fragment reruns can be checked from the page
+    runs = st.session_state.setdefault('panel_runs', {})
+    runs[panel] = runs.get(panel, 0) + 1
 
-    with col2:
-            country = st.selectbox("Select country", Price_df['Country'].unique())
+    if st.session_state.get('show_panel_runs'):
+        st.caption(f"{panel}: run {runs[panel]} at {time.strftime('%H:%M:%S')}")
 
-            # Filter data based on selected country
-            filter_price_data = Price_df[Price_df['Country'] == country]
+# Each panel below is a fragment: changing its selectbox reruns only that panel
 
-            # Create a bar plot
-            st.subheader(f"Room Type Prices")
-            fig4, ax = plt.subplots()
-            sns.barplot(x='Room type', y='Price', data=filter_price_data, ax=ax,color='#FF5A5F')
+def price_statistic_picker():
 
-            ax.set_title(f"Room Prices by Type in {country}", fontsize=12)
-            ax.set_xlabel("Room Type", fontsize=10)
-            ax.set_ylabel("Price", fontsize=10)
-            ax.tick_params(axis='both', which='major', labelsize=8)
-            plt.xticks(rotation=45, ha='right', fontsize=10) 
-            plt.yticks(fontsize=8)
+    from airbnb_aggregates import SKETCH_ACCURACY
+    from airbnb_chart_common import PRICE_STATISTICS
 
-            # Display the plot
-            st.pyplot(fig4)
+    statistic = st.radio("Price statistic", list(PRICE_STATISTICS), horizontal=True, key='price_statistic')
+    if statistic != 'Average':
+        st.caption(f"Medians and percentiles are estimated from per-group price sketches, within {SKETCH_ACCURACY:.0%} "
+                   f"of the exact (interpolated) value. Boxes span p25-p75, whiskers p10-p90.")
+    return statistic
 
-    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    col3, col4 = st.columns([2,2])
+def price_summary(cube, by, where, sort=False):
 
-    with col3:
+    # Quantile columns are only looked up when a quantile view is selected
+    statistic = st.session_state.get('price_statistic', 'Average')
+    if statistic == 'Average':
+        return statistic, cube.rollup(by, where, sort=sort)
+    return statistic, cube.quantiles(by, where, sort=sort)
 
-        property_type = st.selectbox("Select Property type", Price_df['Property type'].unique())
 
-        # Filter data based on selected property type
-        filtered_prop_data = Price_df[Price_df['Property type'] == property_type]
+@st.fragment
+def room_type_panel():
 
-        # Compute mean prices for each country for the selected property type
-        mean_prices = filtered_prop_data.groupby('Country')['Price'].mean().reset_index()
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import price_cube
+        charts = chart_builders()
 
-        # Create a bar plot
-        st.subheader(f"Prices of {property_type}")
-        fig3, ax = plt.subplots()
-        sns.barplot(x='Country', y='Price', data=mean_prices, ax=ax,color='#FF5A5F')
+    note_panel_run('Room type prices')
+    with phase('load', 'Price cube') as record:
+        cube = price_cube()
+        record['rows'] = len(cube.cells)
 
-        # Customize font sizes
-        ax.set_title(f"Prices of {property_type}", fontsize=12)
-        ax.set_xlabel("Country", fontsize=10)
-        ax.set_ylabel("Average Price", fontsize=10)
-        ax.tick_params(axis='both', which='major', labelsize=8)
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        plt.yticks(fontsize=8)
+    room_type = st.selectbox("Select Room type", cube.values('Room type'))
 
-        # Display the plot
+    # Mean (or quantile) prices for each country for the selected room type
+    with phase('aggregate', 'room type') as record:
+        statistic, mean_prices = price_summary(cube, ['Country'], {'Room type': room_type}, sort=True)
+        record['rows'] = len(mean_prices)
 
-        st.pyplot(fig3)
+    # Create a bar plot
+    st.subheader(f"Prices of {room_type}")
+    show_figure(('Room & Property Type Pricing', 'room type', room_type, statistic), 'Price',
+                lambda: charts.price_chart(mean_prices, statistic, 'Country', f"Prices of {room_type}",
+                                           lambda data, label: charts.country_price_bars(data, f"Prices of {room_type}", label)))
 
-    with col4:
+@st.fragment
+def room_types_in_country_panel():
 
-        country = st.selectbox("Select Country", Price_df['Country'].unique())
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import price_cube
+        charts = chart_builders()
 
-        # Filter data based on selected country
-        filter_price_data = Price_df[Price_df['Country'] == country]
+    note_panel_run('Room type prices by country')
+    with phase('load', 'Price cube') as record:
+        cube = price_cube()
+        record['rows'] = len(cube.cells)
 
-        # Create a bar plot
-        st.subheader(f"Property Prices")
-        fig, ax = plt.subplots()
-        sns.barplot(x='Property type', y='Price', data=filter_price_data, ax=ax,color='#FF5A5F')
+    country = st.selectbox("Select country", cube.values('Country'))
 
-        ax.set_title(f"Property Prices by Type in {country}", fontsize=12)
-        ax.set_xlabel("Property Type", fontsize=10)
-        ax.set_ylabel("Price", fontsize=10)
-        ax.tick_params(axis='both', which='major', labelsize=8)
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        plt.yticks(fontsize=8)
+    # Mean prices for each room type in the selected country
+    with phase('aggregate', 'room types in country') as record:
+        statistic, filter_price_data = price_summary(cube, ['Room type'], {'Country': country})
+        record['rows'] = len(filter_price_data)
 
-        # Display the plot
-        st.pyplot(fig)
+    # Create a bar plot
+    st.subheader(f"Room Type Prices")
+    show_figure(('Room & Property Type Pricing', 'room types in country', country, statistic), 'Price',
+                lambda: charts.price_chart(filter_price_data, statistic, 'Room type', f"Room Prices by Type in {country}",
+                                           lambda data, label: charts.type_price_bars(data, 'Room type', "Room Type", f"Room Prices by Type in {country}", label)))
 
-    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
+@st.fragment
+def property_type_panel():
 
-    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Availability by Cities</h1>", unsafe_allow_html=True)
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import price_cube
+        charts = chart_builders()
 
-    Availability_df = pd.read_csv('Availability_data.csv')
-    Availability_df.columns = Availability_df.columns.str.strip()
-    
-    Availability_df = Availability_df[~Availability_df['City'].isin(['Other (Domestic)', 'Other (International)'])] 
-    
+    note_panel_run('Property type prices')
+    with phase('load', 'Price cube') as record:
+        cube = price_cube()
+        record['rows'] = len(cube.cells)
 
-    city_availability = Availability_df.groupby('City')[['next 30', 'next 60', 'next 90', 'next 365']].sum().reset_index()
+    property_type = st.selectbox("Select Property type", cube.values('Property type'))
 
-    # Create the grouped bar chart
-    fig = go.Figure()
-
-    # Add traces for each availability period
-    fig.add_trace(go.Bar(
-        x=city_availability['City'],
-        y=city_availability['next 30'],
-        name='30 Days',
-        marker_color='#767676'
-    ))
-    fig.add_trace(go.Bar(
-        x=city_availability['City'],
-        y=city_availability['next 60'],
-        name='60 Days',
-        marker_color='#484848'
-    ))
-    fig.add_trace(go.Bar(
-        x=city_availability['City'],
-        y=city_availability['next 90'],
-        name='90 Days',
-        marker_color='#FF979A'
-    ))
-    fig.add_trace(go.Bar(
-        x=city_availability['City'],
-        y=city_availability['next 365'],
-        name='365 Days',
-        marker_color='#FF5A5F'
-    ))
-
-    # Update the layout for grouped bars
-    fig.update_layout(
-        barmode='group',
-        title='Availability for Different Periods by City',
-        xaxis_title='City',
-        yaxis_title='Availability',
-        xaxis_tickangle=-45,
-        legend_title='Availability Period'
-    )
+    # Mean prices for each country for the selected property type
+    with phase('aggregate', 'property type') as record:
+        statistic, mean_prices = price_summary(cube, ['Country'], {'Property type': property_type}, sort=True)
+        record['rows'] = len(mean_prices)
 
-    # Display the chart in Streamlit
-    st.plotly_chart(fig)
+    # Create a bar plot
+    st.subheader(f"Prices of {property_type}")
+    show_figure(('Room & Property Type Pricing', 'property type', property_type, statistic), 'Price',
+                lambda: charts.price_chart(mean_prices, statistic, 'Country', f"Prices of {property_type}",
+                                           lambda data, label: charts.country_price_bars(data, f"Prices of {property_type}", label)))
 
+@st.fragment
+def property_types_in_country_panel():
 
-def Neighborhood_page():
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import price_cube
+        charts = chart_builders()
 
-    Price_df = pd.read_csv('Price_data.csv')
+    note_panel_run('Property type prices by country')
+    with phase('load', 'Price cube') as record:
+        cube = price_cube()
+        record['rows'] = len(cube.cells)
 
-    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Neighborhood Price Analysis: A comparison </h1>", unsafe_allow_html=True)
+    country = st.selectbox("Select Country", cube.values('Country'))
 
-    country = st.selectbox("Select your country", Price_df['Country'].unique())
+    # Mean prices for each property type in the selected country
+    with phase('aggregate', 'property types in country') as record:
+        statistic, filter_price_data = price_summary(cube, ['Property type'], {'Country': country})
+        record['rows'] = len(filter_price_data)
 
-    City_data = Price_df[Price_df['Country'] == country]
+    # Create a bar plot
+    st.subheader(f"Property Prices")
+    show_figure(('Room & Property Type Pricing', 'property types in country', country, statistic), 'Price',
+                lambda: charts.price_chart(filter_price_data, statistic, 'Property type', f"Property Prices by Type in {country}",
+                                           lambda data, label: charts.type_price_bars(data, 'Property type', "Property Type", f"Property Prices by Type in {country}", label)))
 
-    # City filter (dependent on selected country)
-    city = st.selectbox("Select your city", City_data['City'].unique())
+@st.fragment
+def availability_panel():
 
-    # Filter the data based on the selected city
-    Suburb_data = City_data[City_data['City'] == city]
+    with phase('import', 'pandas, plotly'):
+        from airbnb_aggregates import city_availability
+        from airbnb_chart_common import availability_bars
 
-    # Compute mean prices for each suburb in the selected city
-    mean_suburb_prices = Suburb_data.groupby('Suburb')['Price'].mean().reset_index()
+    note_panel_run('Availability by city')
 
-    # Sort suburbs by average price in descending order
-    mean_suburb_prices = mean_suburb_prices.sort_values(by='Price', ascending=False)
+    with phase('aggregate', 'availability by city') as record:
+        city_availability = city_availability()
+        record['rows'] = len(city_availability)
 
+    # Create the grouped bar chart
+    fig = availability_bars(city_availability)
+
+    # Display the chart in Streamlit
+    with phase('serialise', 'availability chart'):
+        st.plotly_chart(fig)
 
-    #create chart
-    fig5, ax = plt.subplots(figsize=(10,17))
-    sns.barplot(x='Price', y='Suburb', data=mean_suburb_prices, ax=ax,color='#FF5A5F')
 
-    #customise
-    ax.set_title(f"Average Price of Suburbs in {city}({country})", fontsize=16)
-    ax.set_xlabel("Average Price", fontsize=14)
-    ax.set_ylabel("Suburbs", fontsize=14)
-    ax.tick_params(axis='both', which='major', labelsize=11.5)
+def Room_Property_Pricing():
 
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['left'].set_visible(True)
-    ax.spines['bottom'].set_visible(False)
+    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Country-wise Price Trends: Room and Property Type Insights</h1>", unsafe_allow_html=True)
 
-    for i in ax.containers:
-        ax.bar_label(i, fmt='%.2f', label_type='edge', fontsize=11.5)
+    price_statistic_picker()
 
-    if st.button('Display the suburb prices'):
+    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    # Display the plot
-        st.pyplot(fig5)
+    col1, col2 = st.columns(2)
 
-def Correlation_page():
+    with col1:
+        room_type_panel()
 
-    # Set the title
-    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Correlation Heatmaps </h1>", unsafe_allow_html=True)
+    with col2:
+        room_types_in_country_panel()
 
     st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    # Load the data
-    Corelation_df = pd.read_csv('Corelation_data.csv')
+    col3, col4 = st.columns([2,2])
 
-    # Define the columns for correlation
-    Corr_01 = ['Price', 'Rating', 'Minimum nights', 'Maximum nights', 'Bedroom count', 'Bathroom count']
+    with col3:
+        property_type_panel()
 
-    # Calculate the correlation matrix
-    correlation_matrix = Corelation_df[Corr_01].corr()
+    with col4:
+        property_types_in_country_panel()
 
-    # Plot the heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='Blues', linewidths=.5)
-    plt.title('Price and Rating vs Nights and Rooms count')
+    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    # Display the plot in Streamlit
-    st.pyplot(plt.gcf())
+    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Availability by Cities</h1>", unsafe_allow_html=True)
 
-    # PLOT 3
+    availability_panel()
 
-    # Define the columns for correlation
-    Corr_03 = ['Rating','Review count','Cleanliness score','Communication score','Location score','Pricevalue score']
 
+# Column and direction for each suburb ordering
+SUBURB_SORTS = {
+    'Highest price': ('Price', False),
+    'Lowest price': ('Price', True),
+    'Name': ('Suburb', True),
+}
 
-    # Calculate the correlation matrix
-    correlation_matrix = Corelation_df[Corr_03].corr()
 
-    # Plot the heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='Blues', linewidths=.5)
-    plt.title('Price and Review scores')
+def Neighborhood_page():
 
-    # Display the plot in Streamlit
-    st.pyplot(plt.gcf())
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import price_cube
+        from airbnb_chart_common import PRICE_STATISTICS
+        charts = chart_builders()
 
-    # PLOT 2
+    with phase('load', 'Price cube') as record:
+        cube = price_cube()
+        record['rows'] = len(cube.cells)
+
+    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Neighborhood Price Analysis: A comparison </h1>", unsafe_allow_html=True)
+
+    country = st.selectbox("Select your country", cube.values('Country'))
+
+    # City filter (dependent on selected country)
+    city = st.selectbox("Select your city", cube.values('City', {'Country': country}))
+
+    # The suburb chart stays open across reruns once requested; nothing is
+    # aggregated or drawn for it before then
+    if st.button('Display the suburb prices'):
+        st.session_state['show_suburbs'] = True
+    if not st.session_state.get('show_suburbs'):
+        return
+
+    price_statistic_picker()
+    sort_by = st.radio("Sort suburbs by", list(SUBURB_SORTS), horizontal=True)
+    per_page = st.select_slider("Suburbs per chart", [10, 25, 50, 100], value=25)
+
+    # Compute mean (or quantile) prices for each suburb in the selected city
+    with phase('aggregate', 'suburbs') as record:
+        statistic, mean_suburb_prices = price_summary(cube, ['Suburb'], {'Country': country, 'City': city}, sort=True)
+        record['rows'] = len(mean_suburb_prices)
+
+    # Price orderings follow the statistic on display; box plots sort by median
+    column, ascending = SUBURB_SORTS[sort_by]
+    if column == 'Price':
+        column = PRICE_STATISTICS[statistic] or 'Median'
+    mean_suburb_prices = mean_suburb_prices.sort_values(by=column, ascending=ascending, kind='stable')
+
+    # Only one page of bars is drawn, so the figure size follows what is on screen
+    pages = max(1, -(-len(mean_suburb_prices) // per_page))
+    if st.session_state.get('suburb_page', 1) > pages:
+        st.session_state['suburb_page'] = pages
+    page = st.number_input("Page", min_value=1, max_value=pages, step=1, key='suburb_page')
+    start = (page - 1) * per_page
+    shown = mean_suburb_prices.iloc[start:start + per_page]
+    st.caption(f"Suburbs {start + 1}-{start + len(shown)} of {len(mean_suburb_prices)}")
+
+    # Display the plot
+    show_figure(('Neighborhood Price trends', 'suburbs', country, city, statistic, sort_by, per_page, page), 'Price',
+                lambda: charts.price_chart(shown, statistic, 'Suburb', f"Price distribution of Suburbs in {city}({country})",
+                                           lambda data, label: charts.suburb_price_bars(data, city, country, label), horizontal=True))
+
+def Correlation_page():
+
+    with phase('import', 'pandas, seaborn'):
+        from airbnb_aggregates import CORRELATION_SETS, correlation_stats
+        from airbnb_charts import correlation_heatmap
+
+    # Set the title
+    st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Correlation Heatmaps </h1>", unsafe_allow_html=True)
 
-    # Define the columns for correlation
-    Corr_02 = ['Price','Super host','Review count','Rating']
+    st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    # Calculate the correlation matrix
-    correlation_matrix = Corelation_df[Corr_02].corr()
+    # Correlations for all three heatmaps come from one pass over the data
+    with phase('aggregate', 'correlation pass') as record:
+        stats = correlation_stats()
+        record['rows'] = int(stats.count.max())
 
     # Plot the heatmap
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='Blues', linewidths=.5)
-    plt.title('Price and Availability')
+    show_figure(('Correlation Visualisation', 'Corr_01'), 'Corelation',
+                lambda: correlation_heatmap(stats.corr(CORRELATION_SETS['Corr_01']), 'Price and Rating vs Nights and Rooms count'))
+
+    # PLOT 3
 
-    # Display the plot in Streamlit
-    st.pyplot(plt.gcf())
+    show_figure(('Correlation Visualisation', 'Corr_03'), 'Corelation',
+                lambda: correlation_heatmap(stats.corr(CORRELATION_SETS['Corr_03']), 'Price and Review scores'))
+
+    # PLOT 2
+
+    show_figure(('Correlation Visualisation', 'Corr_02'), 'Corelation',
+                lambda: correlation_heatmap(stats.corr(CORRELATION_SETS['Corr_02']), 'Price and Availability'))
 
 def Super_host_page():
 
-    Superhost_df = pd.read_csv('Superhost_data.csv')
+    with phase('import', 'pandas, seaborn, plotly'):
+        from airbnb_aggregates import host_insights, host_price_sketch
+        charts = chart_builders()
+        from airbnb_data import dataset_version
+        from airbnb_sampling import sampled_view, sampling_note
+
+    # Every table on this page comes from one cached pass over the listings (HostStats)
+    with phase('aggregate', 'host insights') as record:
+        insights = host_insights()
+        record['rows'] = insights['rows']
 
     st.markdown("<h1 style='text-align: center; font-size: 32px;color: #ffffff;'>Superhost Analysis: Country and city wise insights</h1>", unsafe_allow_html=True)
 
+    statistic = price_statistic_picker()
+    if statistic != 'Average':
+        with phase('aggregate', 'price quantiles') as record:
+            sketch = host_price_sketch()
+            country_quantiles = sketch.quantiles(['Country'])
+            city_quantiles = sketch.quantiles(['City'])
+            record['rows'] = len(sketch.buckets)
+
     st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
     col5, col6 = st.columns([5,3])
@@ -441,93 +658,41 @@ def Super_host_page():
     with col5:
         st.subheader("Superhost by Country")
 
-        # Count superhosts by country
-        country_counts = Superhost_df.groupby(['Country', 'Super host']).size().reset_index(name='Count')
-        country_counts['Super host'] = country_counts['Super host'].replace({True: 'Superhost', False: 'Not Superhost', None: 'Not Available'})
-
-        custom_colors = {
-            'Superhost': '#FF5A5F',
-            'Not Superhost': '#767676',
-            'Not Available': '#767676'
-        }
+        country_counts = insights['country_counts']
 
         # Bar chart for countries
-        plt.figure(figsize=(8, 7))
-        sns.barplot(data=country_counts, x='Country', y='Count', hue='Super host', palette=custom_colors)
-        plt.title("Superhost Status by Country")
-        plt.xlabel("Country",fontsize=14)
-        plt.ylabel("Count",fontsize=14)
-        plt.xticks(rotation=90,fontsize=13)
-        for container in plt.gca().containers:
-            plt.gca().bar_label(container)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        show_figure(('Host Insights', 'superhost by country'), 'Superhost',
+                    lambda: charts.superhost_status_bars(country_counts, 'Country', "Superhost Status by Country", (8, 7)))
 
     with col6:
-        Superhost_df.columns = Superhost_df.columns.str.strip()
-
         st.subheader("Average Price")
 
-        # Calculate average price by country
-        country_avg_price = Superhost_df.groupby('Country')['Price'].mean().reset_index()
-        country_avg_price['Price'] = country_avg_price['Price'].round(2)
+        country_avg_price = insights['country_avg_price'] if statistic == 'Average' else country_quantiles
 
         # Bar chart for average price by country
-        plt.figure(figsize=(8,13))
-        sns.barplot(data=country_avg_price, x='Country', y='Price', palette=['#FF5A5F'])
-        plt.title("Average Price by Country",fontsize=16)
-        plt.xlabel("Country",fontsize=16)
-        plt.ylabel("Average Price",fontsize=16)
-        plt.xticks(rotation=90,fontsize=18)
-        for container in plt.gca().containers:
-            plt.gca().bar_label(container)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        show_figure(('Host Insights', 'average price by country', statistic), 'Superhost',
+                    lambda: charts.price_chart(country_avg_price, statistic, 'Country', "Price distribution by Country",
+                                               lambda data, label: charts.average_price_bars(data, 'Country', f"{label or 'Average Price'} by Country", (8,13), 18, label)))
 
 
     with col7:
         st.subheader("Superhost by City")
 
-        # Count superhosts by city
-        city_counts = Superhost_df.groupby(['City', 'Super host']).size().reset_index(name='Count')
-        city_counts['Super host'] = city_counts['Super host'].replace({True: 'Superhost', False: 'Not Superhost', None: 'Not Available'})
-
-        custom_colors = {
-            'Superhost': '#FF5A5F',
-            'Not Superhost': '#767676',
-            'Not Available': '#767676'
-        }
+        city_counts = insights['city_counts']
 
         # Bar chart for cities
-        plt.figure(figsize=(8, 6))
-        sns.barplot(data=city_counts, x='City', y='Count', hue='Super host', palette=custom_colors)
-        plt.title("Superhost Status by City")
-        plt.xlabel("City", fontsize=14)
-        plt.ylabel("Count", fontsize=14)
-        plt.xticks(rotation=90, fontsize=13)
-        for container in plt.gca().containers:
-            plt.gca().bar_label(container)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        show_figure(('Host Insights', 'superhost by city'), 'Superhost',
+                    lambda: charts.superhost_status_bars(city_counts, 'City', "Superhost Status by City", (8, 6)))
 
     with col8:
         st.subheader("Average Price by City")
 
-        # Calculate average price by city
-        city_avg_price = Superhost_df.groupby('City')['Price'].mean().reset_index()
-        city_avg_price['Price'] = city_avg_price['Price'].round(2)
+        city_avg_price = insights['city_avg_price'] if statistic == 'Average' else city_quantiles
 
         # Bar chart for average price by city
-        plt.figure(figsize=(8, 12))
-        sns.barplot(data=city_avg_price, x='City', y='Price', palette=['#FF5A5F'])
-        plt.title("Average Price by City", fontsize=16)
-        plt.xlabel("City", fontsize=16)
-        plt.ylabel("Average Price", fontsize=16)
-        plt.xticks(rotation=90, fontsize=16)
-        for container in plt.gca().containers:
-            plt.gca().bar_label(container)
-        st.pyplot(plt.gcf())
-        plt.clf()
+        show_figure(('Host Insights', 'average price by city', statistic), 'Superhost',
+                    lambda: charts.price_chart(city_avg_price, statistic, 'City', "Price distribution by City",
+                                               lambda data, label: charts.average_price_bars(data, 'City', f"{label or 'Average Price'} by City", (8, 12), 16, label)))
 
     st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
@@ -535,8 +700,6 @@ def Super_host_page():
 
     st.markdown("""<hr style="height:1px;border:none;color:#FF5A5F;background-color:#FF5A5F;" /> """, unsafe_allow_html=True)
 
-    Superhost_df = pd.read_csv('Superhost_data.csv')
-
     col9, col10 = st.columns([2,2])
 
     with col9:
@@ -544,89 +707,100 @@ def Super_host_page():
 
             st.subheader('Avg. host listings')
 
-            unique_cities = Superhost_df['City'].unique()
-
-            city_avg_listings = Superhost_df.groupby('City')['Host Listings'].mean().reindex(unique_cities).reset_index()
-            city_avg_listings['Host Listings'] = city_avg_listings['Host Listings'].round(2)
+            city_avg_listings = insights['city_avg_listings']
 
                 # Create the bar chart
-            plt.figure(figsize=(11, 19))        
-            ax = sns.barplot(data=city_avg_listings, y='City', x='Host Listings', palette=['#FF5A5F'])
-            plt.title("Average Listings per Host by City", fontsize=16)
-            plt.xlabel("Average Listings per Host", fontsize=14)
-            plt.ylabel("City", fontsize=14)
-            plt.xticks(fontsize=20)
-            plt.yticks(rotation=45,fontsize=20)
-            
-
-
-                # Display the chart in Streamlit
-            st.pyplot(plt.gcf())
-            plt.clf() 
+            show_figure(('Host Insights', 'average host listings by city'), 'Superhost',
+                        lambda: charts.city_listing_bars(city_avg_listings, 'Host Listings', "Average Listings per Host", "Average Listings per Host by City"))
 
     with col10:
 
         st.subheader('Total listings by city')
 
-        unique_cities = Superhost_df['City'].unique()
-        
-        city_listing_counts = Superhost_df['City'].value_counts().reindex(unique_cities).reset_index()
-        city_listing_counts.columns = ['City', 'Listing Count']
-
-        
+        city_listing_counts = insights['city_listing_counts']
 
             # Create the bar chart
-        plt.figure(figsize=(11, 19))
-        sns.barplot(data=city_listing_counts, y='City', x='Listing Count', palette=['#FF5A5F'])
-        plt.title("Listing Count by City", fontsize=16)
-        plt.xlabel("Listing Count", fontsize=14)
-        plt.ylabel("City", fontsize=14)
-        plt.xticks(fontsize=20)
-        plt.yticks(rotation=45,fontsize=20)
-
-            # Display the chart in Streamlit
-        st.pyplot(plt.gcf())
+        show_figure(('Host Insights', 'listing count by city'), 'Superhost',
+                    lambda: charts.city_listing_bars(city_listing_counts, 'Listing Count', "Listing Count", "Listing Count by City"))
 
     st.subheader('Avg. Host listings vs Total listings')
 
-    unique_cities = Superhost_df['City'].unique()
-
-    # Calculate total listings in each city
-    city_listing_counts = Superhost_df['City'].value_counts().reindex(unique_cities).reset_index()
-    city_listing_counts.columns = ['City', 'Listing Count']
+    merged_data = insights['merged_data']
 
-    # Calculate the average number of listings per host for each city
-    city_avg_listings = Superhost_df.groupby('City')['Host Listings'].mean().reindex(unique_cities).reset_index()
-    city_avg_listings['Host Listings'] = city_avg_listings['Host Listings'].round(2)
-
-    # Merge the dataframes on 'City'
-    merged_data = pd.merge(city_listing_counts, city_avg_listings, on='City')
+    # One point per city; past the threshold only a sample of cities, shared out
+    # over their countries, is drawn
+    if len(merged_data) > SCATTER_POINT_BUDGET:
+        scatter_budget = st.number_input('Maximum points in the scatter', min_value=1, value=SCATTER_POINT_BUDGET, step=500)
+        sample_key = ('host scatter', dataset_version('Superhost'), int(scatter_budget))
+        merged_data, total = sampled_view(sample_key, lambda: insights['merged_data'], scatter_budget, ['Country'])
+        charge_session('Host Insights', 'sample', sample_key, merged_data)
+        if len(merged_data) < total:
+            st.caption(sampling_note(len(merged_data), total, "cities", ['Country']))
 
     # Create the scatter plot with Plotly
-    fig = px.scatter(merged_data, 
-                    x='Listing Count', 
-                    y='Host Listings', 
-                    text='City', 
-                    labels={
-                        'Listing Count': 'Total Listings in City',
-                        'Host Listings': 'Average Listings per Host'
-                    },
-                    title="Number of Listings per Host vs. Total Listings in Each City")
-
-    fig.update_traces(marker=dict(size=12),
-                    selector=dict(mode='markers+text'),
-                    textposition='top center')
+    fig = charts.listings_scatter(merged_data)
 
     # Display the chart in Streamlit
-    st.plotly_chart(fig)
+    with phase('serialise', 'listings scatter'):
+        st.plotly_chart(fig)
+
+
+
+
+def warmup_progress():
 
+    # Items still building are the only ones a page can end up waiting on
+    status = warmup_status()
+    done = sum(state in ('done', 'failed') for _, state, _ in status)
+    if done == len(status):
+        return
 
+    st.sidebar.progress(done / len(status), text=f"Warming up caches: {done}/{len(status)}")
+    with st.sidebar.expander("Warm-up"):
+        for name, state, seconds in status:
+            st.caption(f"{name}: {state}" + (f" ({seconds}s)" if seconds is not None else ""))
 
 
+def release_memory():
+
+    from airbnb_memory import ledger
+
+    # Leaving a page stops charging this session for its images and samples, and
+    # sessions that have gone quiet stop being charged at all; the shared caches
+    # keep the artefacts for the next visitor
+    previous = st.session_state.get('memory_page')
+    if previous is not None and previous != st.session_state.current_page:
+        ledger.release(session_id(), previous)
+    st.session_state['memory_page'] = st.session_state.current_page
+    ledger.release_idle()
+
+def memory_panel():
+
+    import pandas as pd
+
+    from airbnb_memory import ledger, memory_report
+
+    with st.sidebar.expander("Memory"):
+        st.caption(f"This session: {ledger.usage(session_id()) / 2**20:.1f} of {ledger.budget / 2**20:.0f} MB "
+                   f"of cached images and samples")
+        rows = memory_report()
+        if not rows:
+            st.caption("Nothing is loaded in this process yet.")
+            return
+        report = pd.DataFrame(rows)
+        report['private MB'] = (report.pop('private_bytes') / 2**20).round(2)
+        report['mapped MB'] = (report.pop('mapped_bytes') / 2**20).round(2)
+        st.dataframe(report, hide_index=True)
+        st.caption("Mapped columns are pages of the read-only Arrow files, shared by every session and process. "
+                   "Session rows count their share of the caches above.")
+
 def main():
 
     set_gradient_bg()
 
+    if WARMUP_ENABLED:
+        start_warmup()
+
     st.sidebar.title("Navigation")
 
     if 'current_page' not in st.session_state:  
@@ -645,8 +819,23 @@ def main():
         st.session_state.current_page = 'Correlation Visualisation'
     if st.sidebar.button("Host Insights"):
         st.session_state.current_page = 'Host Insights'
+
+    st.sidebar.radio("Draw charts as", CHART_BACKENDS, index=CHART_BACKENDS.index(DEFAULT_CHART_BACKEND), key='chart_backend')
+    st.sidebar.checkbox("Show panel runs", key='show_panel_runs')
+    st.sidebar.checkbox("Profile page phases", value=os.environ.get('AIRBNB_PROFILE') == '1', key='profile_pages')
+    st.sidebar.checkbox("Show memory use", key='show_memory')
+
+    if WARMUP_ENABLED:
+        warmup_progress()
+
+    # A fresh profile per run; fragment reruns keep adding to the last one
+    st.session_state.pop('page_profile', None)
+    if st.session_state.profile_pages:
+        st.session_state.page_profile = PageProfile(st.session_state.current_page, session_id())
     
 
+    release_memory()
+
         # Display the selected page
     if st.session_state.current_page == "Introduction":
         intro_page()
@@ -661,6 +850,21 @@ def main():
     elif st.session_state.current_page == "Host Insights":
         Super_host_page()
 
+    profile = st.session_state.get('page_profile')
+    if profile is not None:
+        with st.sidebar.expander("Page timings"):
+            if profile.phases:
+                import pandas as pd
+
+                timings = pd.DataFrame(profile.phases)[['phase', 'detail', 'seconds', 'rows', 'allocated_bytes']]
+                st.dataframe(timings, hide_index=True)
+                st.caption(f"Total {timings['seconds'].sum():.3f}s. Logged to {profile.log_path}")
+            else:
+                st.caption("No phases recorded on this page.")
+
+    if st.session_state.show_memory:
+        memory_panel()
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,482 @@
+"""Precomputed aggregates shared by the pages.
+
+Each aggregate also knows how to fold in rows appended to its CSV, so a
+growing file updates it in O(new rows) instead of rebuilding it.
+"""
+
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from airbnb_data import cached_derived, concat_frames, load_dataset, read_csv_chunks
+from airbnb_engine import aggregate, engine_enabled
+
+PRICE_DIMENSIONS = ['Country', 'City', 'Suburb', 'Room type', 'Property type']
+
+
+class PriceCube:
+    """Price sum, sum of squares, count, min and max per dimension combination.
+
+    The base cells group ``Price_data`` by every dimension at once; coarser
+    rollups are derived from those cells, so a chart costs O(groups) rather
+    than a scan over the listings. Groups come back in order of first
+    appearance in the data, like ``unique()`` and seaborn's category order.
+    """
+
+    def __init__(self, df):
+        prices = df['Price'].astype(float)
+        frame = df[PRICE_DIMENSIONS].assign(Price=prices, Price_sq=prices ** 2)
+
+        self.cells = frame.groupby(PRICE_DIMENSIONS, sort=False, dropna=False, observed=True).agg(
+            Sum=('Price', 'sum'),
+            SumSq=('Price_sq', 'sum'),
+            Count=('Price', 'count'),
+            Min=('Price', 'min'),
+            Max=('Price', 'max'),
+        ).reset_index()
+
+        self.sketch = QuantileSketch(df, PRICE_DIMENSIONS)
+
+        self._cuboids = {}
+        self._lock = threading.Lock()
+
+    def appended(self, rows):
+        """A new cube that also counts ``rows``; this one is left as it is."""
+        other = PriceCube(rows)
+        cube = copy.copy(self)
+        cube.cells = _merge_measures(concat_frames([self.cells, other.cells]), PRICE_DIMENSIONS)
+        cube.sketch = self.sketch.merged(other.sketch)
+        cube._cuboids = {}
+        cube._lock = threading.Lock()
+        return cube
+
+    def _cuboid(self, dimensions):
+        # Rollup of the base cells onto ``dimensions``, kept for later lookups
+        key = tuple(column for column in PRICE_DIMENSIONS if column in dimensions)
+
+        with self._lock:
+            cuboid = self._cuboids.get(key)
+        if cuboid is not None:
+            return cuboid
+
+        cuboid = _merge_measures(self.cells, list(key))
+        with self._lock:
+            self._cuboids[key] = cuboid
+        return cuboid
+
+    def rollup(self, by, where=None, sort=False):
+        """Price statistics grouped by ``by`` for rows matching ``where``.
+
+        ``where`` maps dimension names to the single value they must equal.
+        The mean is returned in the ``Price`` column.
+        """
+        where = where or {}
+        summary = self._cuboid(list(by) + list(where))
+
+        for column, value in where.items():
+            summary = summary[summary[column] == value]
+
+        summary = _merge_measures(summary.dropna(subset=list(by)), list(by), sort=sort)
+        summary['Price'] = summary['Sum'] / summary['Count'].where(summary['Count'] > 0)
+        return summary
+
+    def values(self, dimension, where=None):
+        return self.rollup([dimension], where)[dimension].tolist()
+
+    def quantiles(self, by, where=None, sort=False):
+        """``rollup`` plus the QUANTILES columns, estimated from the sketch."""
+        summary = self.rollup(by, where, sort=sort)
+        return summary.merge(self.sketch.quantiles(by, where), on=list(by), how='left')
+
+
+def _merge_measures(cells, by, sort=False):
+    grouped = cells.groupby(by, sort=sort, dropna=False, observed=True)
+    return grouped.agg(
+        Sum=('Sum', 'sum'),
+        SumSq=('SumSq', 'sum'),
+        Count=('Count', 'sum'),
+        Min=('Min', 'min'),
+        Max=('Max', 'max'),
+    ).reset_index()
+
+
+def price_ci95(summary):
+    # Normal-approximation 95% interval of the mean from the cube's moments
+    count = summary['Count'].where(summary['Count'] > 1)
+    variance = (summary['SumSq'] - summary['Sum'] ** 2 / count) / (count - 1)
+    return 1.96 * np.sqrt(variance.clip(lower=0) / count)
+
+
+# Quantile estimates are within this relative error of the true value
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+# Percentiles reported by QuantileSketch.quantiles, by column name
+QUANTILES = {'p10': 0.1, 'p25': 0.25, 'Median': 0.5, 'p75': 0.75, 'p90': 0.9}
+
+
+def sketch_bucket(values):
+    # Logarithmic buckets as in DDSketch: bucket k holds (gamma**(k-1), gamma**k].
+    # Zero (and invalid negative) prices go to one bucket below all the others.
+    values = np.asarray(values, dtype=float)
+    buckets = np.full(len(values), np.iinfo(np.int32).min, dtype=np.int64)
+    positive = values > 0
+    buckets[positive] = np.ceil(np.log(values[positive]) / np.log(_GAMMA))
+    return buckets
+
+
+def bucket_value(buckets):
+    # The bucket's value that is within SKETCH_ACCURACY of everything in it
+    buckets = np.asarray(buckets, dtype=np.int64)
+    values = 2 * _GAMMA ** buckets.astype(float) / (_GAMMA + 1)
+    return np.where(buckets == np.iinfo(np.int32).min, 0.0, values)
+
+
+def _merge_buckets(buckets, by):
+    return buckets.groupby(list(by) + ['Bucket'], sort=False, dropna=False, observed=True)['Count'].sum().reset_index()
+
+
+class QuantileSketch:
+    """Mergeable price quantile sketch per dimension combination.
+
+    Each cell keeps a count per logarithmic bucket of ``Price``; any rollup
+    adds up the bucket counts of its cells, so medians and percentiles of a
+    group cost O(buckets). They interpolate between neighbouring items as
+    ``np.quantile`` does and are within ``SKETCH_ACCURACY`` (relative) of it.
+    """
+
+    def __init__(self, df, dimensions):
+        self.dimensions = list(dimensions)
+        prices = df['Price'].astype(float)
+        located = prices.notna()
+        frame = df.loc[located, self.dimensions].assign(Bucket=sketch_bucket(prices[located]))
+        self.buckets = frame.groupby(self.dimensions + ['Bucket'], sort=False, dropna=False, observed=True).size().reset_index(name='Count')
+
+        self._cuboids = {}
+        self._lock = threading.Lock()
+
+    def merged(self, other):
+        """A sketch of the listings of both this and ``other`` (over the same dimensions)."""
+        sketch = copy.copy(self)
+        sketch.buckets = _merge_buckets(concat_frames([self.buckets, other.buckets]), self.dimensions)
+        sketch._cuboids = {}
+        sketch._lock = threading.Lock()
+        return sketch
+
+    def _cuboid(self, dimensions):
+        # Bucket counts summed onto ``dimensions``, kept for later lookups
+        key = tuple(column for column in self.dimensions if column in dimensions)
+
+        with self._lock:
+            cuboid = self._cuboids.get(key)
+        if cuboid is None:
+            cuboid = _merge_buckets(self.buckets, list(key))
+            with self._lock:
+                self._cuboids[key] = cuboid
+        return cuboid
+
+    def quantiles(self, by, where=None, quantiles=QUANTILES):
+        """One row per ``by`` group matching ``where`` with a column per quantile."""
+        by = list(by)
+        where = where or {}
+        buckets = self._cuboid(by + list(where))
+        for column, value in where.items():
+            buckets = buckets[buckets[column] == value]
+
+        counts = _merge_buckets(buckets.dropna(subset=by), by)
+        counts = counts.sort_values(by + ['Bucket'], kind='stable', ignore_index=True)
+        grouped = counts.groupby(by, sort=False, observed=True)['Count']
+        seen = grouped.cumsum()
+        total = grouped.transform('sum')
+
+        def ranked(rank):
+            # Value of the bucket holding each group's item of that (0-based) rank
+            first = counts[seen > rank].groupby(by, sort=False, observed=True)['Bucket'].first()
+            return pd.Series(bucket_value(first), index=first.index)
+
+        summary = counts[by].drop_duplicates(ignore_index=True)
+        for name, quantile in quantiles.items():
+            # Interpolated between the items on either side of the quantile's
+            # position, like ``np.quantile``
+            position = quantile * (total - 1)
+            below = np.floor(position)
+            lower, upper = ranked(below), ranked(np.minimum(below + 1, total - 1))
+            fraction = (position - below).groupby([counts[column] for column in by], sort=False, observed=True).first()
+            value = (lower + fraction * (upper - lower)).rename(name).reset_index()
+            summary = summary.merge(value, on=by, how='left')
+        return summary
+
+
+def price_cube():
+    return cached_derived('Price', 'price cube', lambda: PriceCube(load_dataset('Price')),
+                          lambda cube, rows: cube.appended(rows))
+
+
+# Column sets of the three heatmaps on the Correlation page
+CORRELATION_SETS = {
+    'Corr_01': ['Price', 'Rating', 'Minimum nights', 'Maximum nights', 'Bedroom count', 'Bathroom count'],
+    'Corr_03': ['Rating', 'Review count', 'Cleanliness score', 'Communication score', 'Location score', 'Pricevalue score'],
+    'Corr_02': ['Price', 'Super host', 'Review count', 'Rating'],
+}
+CORRELATION_COLUMNS = list(dict.fromkeys(column for columns in CORRELATION_SETS.values() for column in columns))
+
+
+class CovarianceAccumulator:
+    """Pairwise-complete co-moments over a fixed set of columns.
+
+    For every pair of columns it keeps the number of rows where both are
+    present, the mean of each over those rows and their (co-)moments, which is
+    what ``DataFrame.corr()`` uses. Accumulators of disjoint row sets combine
+    with ``merge`` (Chan et al.'s parallel update), so a file can be read in
+    chunks and appended rows folded into an existing result.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.count = np.zeros((size, size))
+        # mean[i, j] is the mean of column i over rows where columns i and j are both present
+        self.mean = np.zeros((size, size))
+        self.m2 = np.zeros((size, size))
+        self.comoment = np.zeros((size, size))
+
+    @classmethod
+    def from_frame(cls, df, columns):
+        accumulator = cls(columns)
+        values = df[accumulator.columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        if not present.any():
+            return accumulator
+
+        # Shift each column by its chunk mean so the sums below stay small
+        shift = np.zeros(values.shape[1])
+        has_values = present.any(axis=0)
+        shift[has_values] = np.nanmean(values[:, has_values], axis=0)
+
+        filled = np.where(present, values - shift, 0.0)
+        weights = present.astype(float)
+
+        count = weights.T @ weights
+        # sums[i, j] is the sum of column i over rows where column j is present too
+        sums = filled.T @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, sums / count, 0.0)
+
+        accumulator.count = count
+        accumulator.mean = np.where(count > 0, mean + shift[:, None], 0.0)
+        accumulator.m2 = (filled ** 2).T @ weights - sums * mean
+        accumulator.comoment = filled.T @ filled - sums * mean.T
+        return accumulator
+
+    def merge(self, other):
+        count = self.count + other.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(count > 0, other.count / count, 0.0)
+        delta = other.mean - self.mean
+        correction = self.count * weight
+
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * correction
+        self.comoment = self.comoment + other.comoment + delta * delta.T * correction
+        self.count = count
+        return self
+
+    def update(self, df):
+        return self.merge(CovarianceAccumulator.from_frame(df, self.columns))
+
+    def corr(self, columns):
+        positions = [self.columns.index(column) for column in columns]
+        block = np.ix_(positions, positions)
+
+        m2 = self.m2[block]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment[block] / np.sqrt(m2 * m2.T)
+        corr[self.count[block] < 2] = np.nan
+
+        return pd.DataFrame(np.clip(corr, -1, 1), index=list(columns), columns=list(columns))
+
+
+def _build_correlation():
+    # One chunked pass over the union of the heatmap columns
+    accumulator = CovarianceAccumulator(CORRELATION_COLUMNS)
+    for chunk in read_csv_chunks('Corelation', CORRELATION_COLUMNS):
+        accumulator.update(chunk)
+    return accumulator
+
+
+def _update_correlation(accumulator, rows):
+    return copy.deepcopy(accumulator).update(rows[CORRELATION_COLUMNS])
+
+
+def correlation_stats():
+    return cached_derived('Corelation', 'correlation', _build_correlation, _update_correlation)
+
+
+AVAILABILITY_PERIODS = ['next 30', 'next 60', 'next 90', 'next 365']
+
+# Catch-all markets left out of the per-city availability chart
+OTHER_CITIES = ['Other (Domestic)', 'Other (International)']
+
+
+def city_sums(df):
+    df = df[~df['City'].isin(OTHER_CITIES)]
+    # Summed in 64 bits: grouped sums keep a downcast int16 column's width and would overflow
+    periods = df[AVAILABILITY_PERIODS].astype({period: 'int64' for period in AVAILABILITY_PERIODS
+                                               if pd.api.types.is_integer_dtype(df[period].dtype)})
+    return periods.groupby(df['City'], observed=True).sum().reset_index()
+
+
+def _update_city_availability(sums, rows):
+    return city_sums(concat_frames([sums, city_sums(rows)]))
+
+
+AVAILABILITY_SUMS = {period: (period, 'sum') for period in AVAILABILITY_PERIODS}
+
+
+def city_availability():
+    """Days available in each period summed per named city."""
+    if engine_enabled():
+        # Scans the four period columns and City; the Parquet copy is rewritten on change
+        return cached_derived('Availability', 'city availability',
+                              lambda: aggregate('Availability', ['City'], AVAILABILITY_SUMS, exclude={'City': OTHER_CITIES}))
+    return cached_derived('Availability', 'city availability', lambda: city_sums(load_dataset('Availability')),
+                          _update_city_availability)
+
+
+SUPERHOST_LABELS = {True: 'Superhost', False: 'Not Superhost', None: 'Not Available'}
+
+
+HOST_KEYS = ['Country', 'City', 'Super host']
+
+# Superhost listings above which HostStats splits the work by country across threads
+PARALLEL_HOST_ROWS = int(os.environ.get('AIRBNB_PARALLEL_HOST_ROWS', 500_000))
+
+
+def _host_cells(df, offset=0):
+    # One groupby for every measure of the page; First orders the cells like the rows
+    frame = df[HOST_KEYS].assign(
+        Position=np.arange(offset, offset + len(df)),
+        Price=df['Price'].astype(float),
+        Listings=df['Host Listings'].astype(float),
+    )
+    return frame.groupby(HOST_KEYS, sort=False, dropna=False, observed=True).agg(
+        First=('Position', 'min'),
+        Rows=('Position', 'size'),
+        PriceSum=('Price', 'sum'),
+        PriceCount=('Price', 'count'),
+        ListingsSum=('Listings', 'sum'),
+        ListingsCount=('Listings', 'count'),
+    ).reset_index()
+
+
+def _partition_cells(df, rows):
+    cells = _host_cells(df.iloc[rows])
+    cells['First'] = rows[cells['First'].to_numpy()]
+    return cells
+
+
+def _merge_host_cells(cells):
+    merged = cells.groupby(HOST_KEYS, sort=False, dropna=False, observed=True).agg(
+        First=('First', 'min'),
+        Rows=('Rows', 'sum'),
+        PriceSum=('PriceSum', 'sum'),
+        PriceCount=('PriceCount', 'sum'),
+        ListingsSum=('ListingsSum', 'sum'),
+        ListingsCount=('ListingsCount', 'sum'),
+    )
+    return merged.sort_values('First', kind='stable').reset_index()
+
+
+def _mean(totals, column):
+    count = totals[f'{column}Count']
+    return (totals[f'{column}Sum'] / count.where(count > 0)).round(2)
+
+
+class HostStats:
+    """Every Superhost page table, from one pass over the listings.
+
+    The listings are grouped once by Country, City and Super host (missing
+    values included) into row counts and sums and counts of Price and Host
+    Listings. Each chart's table is a rollup of those cells, made once and
+    shared, and indexed like a dict: ``stats['city_counts']``. Cells keep
+    the position of their first row, so partitions of the listings (say one
+    per country, built in parallel) and appended rows merge back in the order
+    of the data.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.rows = int(cells['Rows'].sum())
+        self.tables = self._tables()
+
+    @classmethod
+    def from_frame(cls, df, workers=None):
+        if workers is None:
+            workers = os.cpu_count() if len(df) > PARALLEL_HOST_ROWS else 1
+        countries = df['Country'].cat.codes if isinstance(df['Country'].dtype, pd.CategoricalDtype) else pd.factorize(df['Country'])[0]
+        if workers <= 1 or countries.max() < 1:
+            return cls(_host_cells(df))
+
+        # Whole countries per partition, so no cell is split between threads
+        partition = np.asarray(countries) % workers
+        parts = [np.flatnonzero(partition == number) for number in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            cells = list(pool.map(lambda rows: _partition_cells(df, rows), [rows for rows in parts if len(rows)]))
+        return cls(pd.concat(cells, ignore_index=True).sort_values('First', kind='stable', ignore_index=True))
+
+    def merged(self, df):
+        """New stats that also count ``df``, rows appended after this data."""
+        added = _host_cells(df, offset=self.rows)
+        return HostStats(_merge_host_cells(concat_frames([self.cells, added])))
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def _status_counts(self, by):
+        cells = self.cells.dropna(subset=[by, 'Super host'])
+        counts = cells.groupby([by, 'Super host'], observed=True)['Rows'].sum().reset_index(name='Count')
+        counts['Super host'] = counts['Super host'].replace(SUPERHOST_LABELS)
+        return counts
+
+    def _totals(self, by, sort=True):
+        return self.cells.groupby(by, sort=sort, observed=True)[
+            ['Rows', 'PriceSum', 'PriceCount', 'ListingsSum', 'ListingsCount']].sum().reset_index()
+
+    def _tables(self):
+        country = self._totals('Country')
+        city = self._totals('City')
+        # Cities in order of first appearance, like ``unique()``
+        cities = self._totals('City', sort=False)
+
+        city_listing_counts = pd.DataFrame({'City': cities['City'], 'Listing Count': cities['Rows']})
+        city_avg_listings = pd.DataFrame({'City': cities['City'], 'Host Listings': _mean(cities, 'Listings')})
+        # The country of each city's first listing, which the scatter samples by
+        first_cells = self.cells.dropna(subset=['City']).drop_duplicates('City')
+        city_country = cities['City'].map(pd.Series(first_cells['Country'].to_numpy(), index=first_cells['City'].to_numpy()))
+        return {
+            'country_counts': self._status_counts('Country'),
+            'country_avg_price': pd.DataFrame({'Country': country['Country'], 'Price': _mean(country, 'Price')}),
+            'city_counts': self._status_counts('City'),
+            'city_avg_price': pd.DataFrame({'City': city['City'], 'Price': _mean(city, 'Price')}),
+            'city_avg_listings': city_avg_listings,
+            'city_listing_counts': city_listing_counts,
+            'merged_data': pd.merge(city_listing_counts, city_avg_listings, on='City').assign(Country=city_country),
+            'rows': self.rows,
+        }
+
+
+def host_insights():
+    """The Superhost page's country and city tables, as a HostStats keyed by chart."""
+    return cached_derived('Superhost', 'host insights', lambda: HostStats.from_frame(load_dataset('Superhost')),
+                          lambda stats, rows: stats.merged(rows))
+
+
+def host_price_sketch():
+    """Price quantiles per Country and City of the Superhost listings."""
+    dimensions = ['Country', 'City']
+    return cached_derived('Superhost', 'price sketch', lambda: QuantileSketch(load_dataset('Superhost'), dimensions),
+                          lambda sketch, rows: sketch.merged(QuantileSketch(rows, dimensions)))
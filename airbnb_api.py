@@ -0,0 +1,230 @@
+"""Local JSON API over the aggregates behind the pricing, availability and host pages.
+
+    python airbnb_api.py --port 8502
+
+    GET /prices?by=Country&room_type=Private+room
+    GET /availability?country=Spain
+    GET /superhost?by=City&country=Brazil
+
+Filters are ``country``, ``city``, ``room_type`` and ``property_type``
+(``/prices`` only), each matching a single value. Every response carries an
+ETag and Last-Modified derived from the versions of the CSVs it reads, and a
+request whose ``If-None-Match`` or ``If-Modified-Since`` still matches gets a
+304 from a stat of those files, without touching the data.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import airbnb_data
+from airbnb_aggregates import AVAILABILITY_SUMS, OTHER_CITIES, PRICE_DIMENSIONS, SUPERHOST_LABELS, city_sums, price_cube
+from airbnb_engine import aggregate, engine_enabled
+
+FILTERS = {'country': 'Country', 'city': 'City', 'room_type': 'Room type', 'property_type': 'Property type'}
+
+# Response bodies kept per ETag, so repeat requests without validators skip the work too
+RESPONSE_CACHE_SIZE = 256
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def _records(df):
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _where(params, allowed):
+    where = {}
+    for name, values in params.items():
+        if name == 'by':
+            continue
+        if name not in allowed:
+            raise ApiError(f"unknown parameter '{name}' (expected one of: by, {', '.join(allowed)})")
+        where[FILTERS[name]] = values[-1]
+    return where
+
+
+def _by(params, allowed, default):
+    by = params.get('by', [default])[-1]
+    if by not in allowed:
+        raise ApiError(f"'by' must be one of: {', '.join(allowed)}")
+    return by
+
+
+def _filtered(df, where):
+    for column, value in where.items():
+        df = df[df[column] == value]
+    return df
+
+
+def prices(params):
+    by = _by(params, PRICE_DIMENSIONS, 'Country')
+    where = _where(params, ['country', 'city', 'room_type', 'property_type'])
+    summary = price_cube().rollup([by], where, sort=True)
+    return _records(summary[[by, 'Price', 'Count', 'Min', 'Max']].round({'Price': 2}))
+
+
+def availability(params):
+    where = _where(params, ['country', 'city'])
+    if engine_enabled():
+        return _records(aggregate('Availability', ['City'], AVAILABILITY_SUMS, where, {'City': OTHER_CITIES}))
+
+    return _records(city_sums(_filtered(airbnb_data.load_dataset('Availability'), where)))
+
+
+def superhost(params):
+    by = _by(params, ['Country', 'City'], 'Country')
+    where = _where(params, ['country', 'city'])
+    measures = {'Price': ('Price', 'mean'), 'Listings': ('Price', 'size'), 'Host Listings': ('Host Listings', 'mean')}
+
+    if engine_enabled():
+        counts = aggregate('Superhost', [by, 'Super host'], {'Count': (by, 'size')}, where)
+        averages = aggregate('Superhost', [by], measures, where)
+    else:
+        df = _filtered(airbnb_data.load_dataset('Superhost'), where)
+        counts = df.groupby([by, 'Super host'], observed=True).size().reset_index(name='Count')
+        averages = df.astype({'Price': float, 'Host Listings': float}).groupby(by, observed=True).agg(**measures).reset_index()
+    counts['Super host'] = counts['Super host'].replace(SUPERHOST_LABELS)
+    return {'status_counts': _records(counts), 'averages': _records(averages.round(2))}
+
+
+# Endpoint: (handler, datasets it reads)
+ENDPOINTS = {
+    '/prices': (prices, ['Price']),
+    '/availability': (availability, ['Availability']),
+    '/superhost': (superhost, ['Superhost']),
+}
+
+
+class _ResponseCache:
+
+    def __init__(self, size):
+        self.size = size
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+            return body
+
+    def put(self, etag, body):
+        with self._lock:
+            self._bodies[etag] = body
+            while len(self._bodies) > self.size:
+                self._bodies.popitem(last=False)
+
+
+_responses = _ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+def validators(path, query, datasets):
+    """ETag and Last-Modified for a request, from the source files' versions alone."""
+    signatures = [airbnb_data.source_signature(name) for name in datasets]
+    key = json.dumps([path, sorted(query.items()), [airbnb_data.dataset_version(name) for name in datasets]])
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+    modified = max(mtime for mtime, _ in signatures) / 1e9
+    return etag, modified
+
+
+def _not_modified(headers, etag, modified):
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            # HTTP dates have whole seconds
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path in ('', '/'):
+            return self._send(HTTPStatus.OK, {'endpoints': sorted(ENDPOINTS), 'filters': sorted(FILTERS)})
+        if url.path not in ENDPOINTS:
+            return self._send(HTTPStatus.NOT_FOUND, {'error': f'no endpoint {url.path}'})
+
+        handler, datasets = ENDPOINTS[url.path]
+        params = parse_qs(url.query)
+        try:
+            etag, modified = validators(url.path, {name: values[-1] for name, values in params.items()}, datasets)
+        except OSError as error:
+            return self._send(HTTPStatus.SERVICE_UNAVAILABLE, {'error': f'data unavailable: {error}'})
+
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True), 'Cache-Control': 'no-cache'}
+        if _not_modified(self.headers, etag, modified):
+            return self._send(HTTPStatus.NOT_MODIFIED, None, headers)
+
+        body = _responses.get(etag)
+        if body is None:
+            try:
+                result = handler(params)
+            except ApiError as error:
+                return self._send(error.status, {'error': str(error)})
+            body = json.dumps({'version': {name: airbnb_data.dataset_version(name) for name in datasets},
+                               'data': result}).encode()
+            _responses.put(etag, body)
+        self._send(HTTPStatus.OK, body, headers)
+
+    def _send(self, status, body, headers=None):
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+
+def serve(host='127.0.0.1', port=8502):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    print(f'Serving the Airbnb API on http://{host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--data-dir', help='directory with the five CSVs (default: AIRBNB_DATA_DIR or .)')
+    args = parser.parse_args()
+
+    if args.data_dir:
+        airbnb_data.DATA_DIR = args.data_dir
+        airbnb_data.CACHE_DIR = os.path.join(args.data_dir, '.airbnb_cache')
+    serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
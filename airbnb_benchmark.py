@@ -0,0 +1,358 @@
+"""Headless benchmarks for the Airbnb pages on synthetic data.
+
+    python airbnb_benchmark.py --rows 10000 100000 1000000
+    python airbnb_benchmark.py --rows 100000 --compare benchmarks/<earlier run>.json
+    python airbnb_benchmark.py --imports
+
+Synthetic copies of the five CSVs are generated per size, then data loading,
+filtering, aggregation and full page runs (through Streamlit's AppTest) are
+timed. Results are written as JSON so runs on different commits can be compared.
+
+``--imports`` instead opens each page once in a fresh interpreter under
+``python -X importtime`` and reports which packages the page pulled in and
+how long they took, to keep the startup import budget in check.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import airbnb_data
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Airbnb_stream.py')
+
+COUNTRIES = ['United States', 'Brazil', 'Spain', 'Portugal', 'Turkey', 'Canada', 'Australia', 'Hong Kong', 'China']
+ROOM_TYPES = ['Entire home/apt', 'Private room', 'Shared room']
+PROPERTY_TYPES = ['Apartment', 'House', 'Condominium', 'Serviced apartment', 'Loft', 'Townhouse', 'Guest suite']
+OTHER_CITIES = ['Other (Domestic)', 'Other (International)']
+
+# Rows generated at a time, so 10M-row files do not need 10M rows in memory
+GENERATE_CHUNK = 1_000_000
+
+
+def _chunk(rng, size, cities_per_country, suburbs_per_city):
+    country = rng.integers(0, len(COUNTRIES), size)
+    city = rng.integers(0, cities_per_country, size)
+    suburb = rng.integers(0, suburbs_per_city, size)
+
+    # object, not a fixed-width string array, so longer catch-all names are not truncated
+    city_names = np.array([f'{COUNTRIES[c]} city {i}' for c in range(len(COUNTRIES)) for i in range(cities_per_country)], dtype=object)
+    city_name = city_names[country * cities_per_country + city]
+    # A small share of listings sit in the catch-all markets the availability chart drops
+    other = rng.random(size) < 0.02
+    city_name[other] = rng.choice(OTHER_CITIES, other.sum())
+
+    price = np.round(rng.lognormal(4.6, 0.7, size), 2)
+    rating = rng.integers(20, 101, size).astype(float)
+    rating[rng.random(size) < 0.1] = np.nan
+    super_host = rng.choice(np.array([True, False, None], dtype=object), size, p=[0.3, 0.65, 0.05])
+
+    return pd.DataFrame({
+        'Country': np.array(COUNTRIES)[country],
+        'City': city_name,
+        'Suburb': np.char.add(np.char.add(city_name.astype(str), ' suburb '), suburb.astype(str)),
+        'Room type': rng.choice(ROOM_TYPES, size, p=[0.55, 0.4, 0.05]),
+        'Property type': rng.choice(PROPERTY_TYPES, size),
+        'Price': price,
+        'Rating': rating,
+        'Longitude': rng.uniform(-40, 60, size).round(5),
+        'Latitude': rng.uniform(-120, 150, size).round(5),
+        'Super host': super_host,
+        'Host Listings': rng.geometric(0.3, size),
+        'Minimum nights': rng.integers(1, 30, size),
+        'Maximum nights': rng.integers(30, 1125, size),
+        'Bedroom count': rng.integers(0, 6, size),
+        'Bathroom count': rng.integers(0, 4, size),
+        'Review count': rng.geometric(0.02, size),
+        'Cleanliness score': rng.integers(2, 11, size),
+        'Communication score': rng.integers(2, 11, size),
+        'Location score': rng.integers(2, 11, size),
+        'Pricevalue score': rng.integers(2, 11, size),
+        'next 30': rng.integers(0, 31, size),
+        'next 60': rng.integers(0, 61, size),
+        'next 90': rng.integers(0, 91, size),
+        'next 365': rng.integers(0, 366, size),
+    })
+
+
+DATASET_COLUMNS = {
+    'Geospatial': ['Country', 'City', 'Suburb', 'Price', 'Rating', 'Room type', 'Longitude', 'Latitude'],
+    'Price': ['Country', 'City', 'Suburb', 'Room type', 'Property type', 'Price'],
+    'Availability': ['Country', 'City', 'next 30', 'next 60', 'next 90', 'next 365'],
+    'Corelation': ['Price', 'Rating', 'Minimum nights', 'Maximum nights', 'Bedroom count', 'Bathroom count',
+                   'Super host', 'Review count', 'Cleanliness score', 'Communication score', 'Location score',
+                   'Pricevalue score'],
+    'Superhost': ['Country', 'City', 'Super host', 'Price', 'Host Listings'],
+}
+
+
+def generate(directory, rows, seed=0):
+    """Write synthetic versions of the five datasets with ``rows`` listings each."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    # Keep cities and suburbs growing with the data, like real exports
+    cities_per_country = max(3, min(60, rows // 20_000))
+    suburbs_per_city = max(5, min(300, rows // 5_000))
+
+    for start in range(0, rows, GENERATE_CHUNK):
+        chunk = _chunk(rng, min(GENERATE_CHUNK, rows - start), cities_per_country, suburbs_per_city)
+        for name, columns in DATASET_COLUMNS.items():
+            path = os.path.join(directory, airbnb_data.DATASETS[name])
+            chunk[columns].to_csv(path, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+
+
+def _measure(results, rows, phase, target, run, memory=True):
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        value = run()
+    finally:
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+
+    results.append({'rows': rows, 'phase': phase, 'target': target, 'seconds': round(seconds, 6), 'peak_bytes': peak})
+    print(f'{rows:>10} {phase:<10} {target:<40} {seconds:10.4f}s' + (f' {peak / 2 ** 20:10.1f} MiB' if memory else ''))
+    return value
+
+
+def _page_run(page, interact=None):
+    from streamlit.testing.v1 import AppTest
+
+    def run():
+        app = AppTest.from_file(APP_PATH, default_timeout=600)
+        app.session_state['current_page'] = page
+        app.run()
+        if interact is not None:
+            interact(app)
+        if app.exception:
+            raise RuntimeError(f'{page}: {app.exception[0].value}')
+    return run
+
+
+def _show_all_listings(app):
+    app.multiselect[0].set_value(list(app.multiselect[0].options)).run()
+    next(button for button in app.button if button.label == 'Display Map').click().run()
+
+
+def _show_suburbs(app):
+    next(button for button in app.button if button.label == 'Display the suburb prices').click().run()
+
+
+PAGES = [
+    ('Geospatial Visualisation', _show_all_listings),
+    ('Room & Property Type Pricing', None),
+    ('Neighborhood Price trends', _show_suburbs),
+    ('Correlation Visualisation', None),
+    ('Host Insights', None),
+]
+
+
+IMPORT_MARKER = '-- airbnb page run --'
+
+
+def _import_child(page):
+    # Runs under -X importtime: everything imported after the marker is the page's own cost
+    from streamlit.testing.v1 import AppTest
+
+    print(IMPORT_MARKER, file=sys.stderr, flush=True)
+    app = AppTest.from_file(APP_PATH, default_timeout=600)
+    app.session_state['current_page'] = page
+    app.run()
+
+
+def page_imports(directory, page):
+    """Cumulative import seconds per top-level package when ``page`` is first opened."""
+    env = dict(os.environ, AIRBNB_DATA_DIR=directory, AIRBNB_CACHE_DIR=os.path.join(directory, '.airbnb_cache'),
+               AIRBNB_PROFILE='0')
+    child = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--import-child', page],
+                           capture_output=True, text=True, env=env, check=True)
+
+    lines = child.stderr.splitlines()
+    packages = {}
+    for line in lines[lines.index(IMPORT_MARKER) + 1:]:
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue
+        # Only top-level entries, so nested imports are not counted twice
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative) / 1e6
+    return packages
+
+
+def import_report(directory):
+    results = []
+    for page in ['Introduction'] + [page for page, _ in PAGES]:
+        packages = page_imports(directory, page)
+        total = sum(packages.values())
+        top = sorted(packages.items(), key=lambda item: -item[1])[:6]
+        print(f"{page:<30} {total:8.3f}s  " + ', '.join(f'{name} {seconds:.3f}s' for name, seconds in top))
+        results.extend({'rows': None, 'phase': 'import', 'target': f'{page}: {name}', 'seconds': round(seconds, 6),
+                        'peak_bytes': None} for name, seconds in packages.items())
+        results.append({'rows': None, 'phase': 'import', 'target': page, 'seconds': round(total, 6), 'peak_bytes': None})
+    return results
+
+
+def benchmark(directory, rows, memory=True):
+    from airbnb_aggregates import city_availability, correlation_stats, host_insights, price_cube
+    from airbnb_index import filter_index
+
+    results = []
+
+    # Load: first from the CSV (which also writes the columnar copy), then from that copy
+    shutil.rmtree(airbnb_data.CACHE_DIR, ignore_errors=True)
+    for name in airbnb_data.DATASETS:
+        airbnb_data.clear_cache()
+        _measure(results, rows, 'load', f'{name} (csv)', lambda: airbnb_data.load_dataset(name), memory)
+        airbnb_data.clear_cache()
+        df = _measure(results, rows, 'load', f'{name} (columnar)', lambda: airbnb_data.load_dataset(name), memory)
+
+        # Resident size of the shared frame after compaction
+        size = int(df.memory_usage(deep=True).sum())
+        results.append({'rows': rows, 'phase': 'memory', 'target': name, 'seconds': None, 'peak_bytes': size})
+        print(f"{rows:>10} {'memory':<10} {name:<40} {size / 2 ** 20:10.1f} MiB")
+
+    # Filter: index build, then a set of random filter panel states
+    index = _measure(results, rows, 'filter', 'Geospatial index build', filter_index, memory)
+    rng = np.random.default_rng(1)
+
+    def run_filters():
+        for _ in range(20):
+            countries = list(rng.choice(index.countries, rng.integers(1, 4), replace=False))
+            low, high = sorted(rng.uniform(*index.price_bounds, 2))
+            index.filter(countries, [], (low, high), index.rating_bounds)
+    _measure(results, rows, 'filter', 'Geospatial 20 lookups', run_filters, memory)
+
+    def run_viewports():
+        # City-sized map views over the whole filter range
+        for _ in range(20):
+            low = (rng.uniform(-40, 58), rng.uniform(-120, 148))
+            index.filter(index.countries, [], index.price_bounds, index.rating_bounds, (low, (low[0] + 2, low[1] + 2)))
+    _measure(results, rows, 'filter', 'Geospatial 20 viewport lookups', run_viewports, memory)
+
+    # Aggregate: prebuilt aggregates and the lookups the pricing pages make
+    cube = _measure(results, rows, 'aggregate', 'Price cube build', price_cube, memory)
+
+    def run_rollups():
+        for room_type in cube.values('Room type'):
+            cube.rollup(['Country'], {'Room type': room_type}, sort=True)
+        for country in cube.values('Country'):
+            cube.rollup(['Property type'], {'Country': country})
+    _measure(results, rows, 'aggregate', 'Price cube rollups', run_rollups, memory)
+
+    def run_quantiles():
+        for room_type in cube.values('Room type'):
+            cube.quantiles(['Country'], {'Room type': room_type}, sort=True)
+        for country in cube.values('Country'):
+            cube.quantiles(['Property type'], {'Country': country})
+    _measure(results, rows, 'aggregate', 'Price sketch quantiles', run_quantiles, memory)
+    _measure(results, rows, 'aggregate', 'Correlation pass', correlation_stats, memory)
+    _measure(results, rows, 'aggregate', 'Availability by city', city_availability, memory)
+    _measure(results, rows, 'aggregate', 'Host insights', host_insights, memory)
+
+    # Render: whole page runs with warm data caches
+    for page, interact in PAGES:
+        _measure(results, rows, 'render', page, _page_run(page, interact), memory)
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_PATH), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(previous_path, results):
+    with open(previous_path) as handle:
+        previous = {(r['rows'], r['phase'], r['target']): r for r in json.load(handle)['results']}
+
+    print(f"\n{'rows':>10} {'phase':<10} {'target':<40} {'before':>10} {'after':>10} {'ratio':>7}")
+    for result in results:
+        before = previous.get((result['rows'], result['phase'], result['target']))
+        if before is None or not before['seconds']:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        print(f"{result['rows']:>10} {result['phase']:<10} {result['target']:<40} "
+              f"{before['seconds']:10.4f} {result['seconds']:10.4f} {ratio:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--data-dir', help='keep the generated datasets here instead of a temporary directory')
+    parser.add_argument('--output', help='result file (default: benchmarks/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc peak memory tracking')
+    parser.add_argument('--imports', action='store_true', help='report the modules each page imports on first use')
+    parser.add_argument('--import-child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    if args.import_child:
+        _import_child(args.import_child)
+        return
+
+    commit = _git_commit()
+    results = []
+
+    if args.imports:
+        directory = args.data_dir or tempfile.mkdtemp(prefix='airbnb-bench-')
+        try:
+            generate(directory, args.rows[0] if len(args.rows) == 1 else 10_000)
+            print(f"{'page':<30} {'imports':>9}  slowest packages")
+            results = import_report(directory)
+        finally:
+            if not args.data_dir:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    for rows in args.rows if not args.imports else []:
+        directory = os.path.join(args.data_dir, str(rows)) if args.data_dir else tempfile.mkdtemp(prefix='airbnb-bench-')
+        try:
+            print(f'Generating {rows} rows in {directory}')
+            generate(directory, rows)
+
+            airbnb_data.DATA_DIR = directory
+            airbnb_data.CACHE_DIR = os.path.join(directory, '.airbnb_cache')
+            airbnb_data.clear_cache()
+
+            results.extend(benchmark(directory, rows, memory=not args.no_memory))
+        finally:
+            if not args.data_dir:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    output = args.output or os.path.join('benchmarks', f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump({
+            'commit': commit,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__,
+            'cpus': os.cpu_count(),
+            'results': results,
+        }, handle, indent=2)
+    print(f'\nWrote {output}')
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Chart settings and helpers shared by the matplotlib and Plotly builders.
+
+Nothing here imports a plotting library at module level, so the browser
+backend (``airbnb_webcharts``) and the pages can use them without loading
+matplotlib and seaborn. The two charts that are Plotly figures in both
+backends live here too and import plotly on first use.
+"""
+
+import pandas as pd
+
+
+def plain(df):
+
+    # Shared categorical dimensions carry every value of the column; seaborn and
+    # plotly would draw an empty slot for each one, so plot plain strings
+    categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    return df.astype({column: object for column in categorical}) if categorical else df
+
+
+# Price statistics the pages offer, and the summary column each one plots
+PRICE_STATISTICS = {
+    'Average': 'Price',
+    'Median': 'Median',
+    '90th percentile': 'p90',
+    'Distribution': None,
+}
+
+
+def price_chart(summary, statistic, x, title, bars, box_plot, horizontal=False):
+    """``bars(data, price_label)`` over the chosen statistic, or ``box_plot`` for 'Distribution'.
+
+    ``summary`` needs the QUANTILES columns for anything but 'Average'. Each
+    backend passes its own ``box_plot(summary, x, title, horizontal)``.
+    """
+    if statistic == 'Distribution':
+        return box_plot(summary, x, title, horizontal)
+    if statistic == 'Average':
+        return bars(summary, None)
+    return bars(summary.assign(Price=summary[PRICE_STATISTICS[statistic]].round(2)), f"{statistic} price")
+
+
+SUPERHOST_COLORS = {
+    'Superhost': '#FF5A5F',
+    'Not Superhost': '#767676',
+    'Not Available': '#767676'
+}
+
+
+# The two interactive charts are Plotly figures; plotly is imported on first use
+def availability_bars(city_availability):
+
+    import plotly.graph_objects as go
+
+    city_availability = plain(city_availability)
+
+    fig = go.Figure()
+
+    # Add traces for each availability period
+    fig.add_trace(go.Bar(
+        x=city_availability['City'],
+        y=city_availability['next 30'],
+        name='30 Days',
+        marker_color='#767676'
+    ))
+    fig.add_trace(go.Bar(
+        x=city_availability['City'],
+        y=city_availability['next 60'],
+        name='60 Days',
+        marker_color='#484848'
+    ))
+    fig.add_trace(go.Bar(
+        x=city_availability['City'],
+        y=city_availability['next 90'],
+        name='90 Days',
+        marker_color='#FF979A'
+    ))
+    fig.add_trace(go.Bar(
+        x=city_availability['City'],
+        y=city_availability['next 365'],
+        name='365 Days',
+        marker_color='#FF5A5F'
+    ))
+
+    # Update the layout for grouped bars
+    fig.update_layout(
+        barmode='group',
+        title='Availability for Different Periods by City',
+        xaxis_title='City',
+        yaxis_title='Availability',
+        xaxis_tickangle=-45,
+        legend_title='Availability Period'
+    )
+
+    return fig
+
+
+def listings_scatter(merged_data, render_mode='auto'):
+
+    import plotly.express as px
+
+    merged_data = plain(merged_data)
+
+    fig = px.scatter(merged_data, 
+                    x='Listing Count', 
+                    y='Host Listings', 
+                    text='City', 
+                    render_mode=render_mode,
+                    labels={
+                        'Listing Count': 'Total Listings in City',
+                        'Host Listings': 'Average Listings per Host'
+                    },
+                    title="Number of Listings per Host vs. Total Listings in Each City")
+
+    fig.update_traces(marker=dict(size=12),
+                    selector=dict(mode='markers+text'),
+                    textposition='top center')
+
+    return fig
@@ -0,0 +1,246 @@
+"""Figures for the pages and a shared cache of their images.
+
+Each builder returns a new Figure and does not touch Streamlit, so the same
+charts can be rendered outside the app.
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from airbnb_aggregates import price_ci95
+# Shared with the Plotly builders; availability_bars and listings_scatter are Plotly already
+from airbnb_chart_common import PRICE_STATISTICS, SUPERHOST_COLORS, availability_bars, listings_scatter, plain  # noqa: F401
+from airbnb_chart_common import price_chart as _price_chart
+from airbnb_memory import register_cache
+
+# Images kept across sessions before the least recently used ones are dropped
+FIGURE_CACHE_BYTES = int(os.environ.get('AIRBNB_FIGURE_CACHE_MB', 64)) * 1024 * 1024
+
+
+class FigureCache:
+    """LRU cache of rendered PNG images bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._images:
+                self.size -= len(self._images.pop(key))
+            if len(image) > self.max_bytes:
+                return
+
+            self._images[key] = image
+            self.size += len(image)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is not None:
+                self.size -= len(image)
+
+
+figure_cache = FigureCache(FIGURE_CACHE_BYTES)
+register_cache('figure', lambda: figure_cache.size, figure_cache.discard)
+
+# pyplot keeps a global "current figure", so figures are drawn one at a time
+_draw_lock = threading.Lock()
+
+
+def figure_bytes(fig, format='png'):
+    # Same settings st.pyplot uses; the figure is closed once it is serialised
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=format, dpi=200, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_png(key, draw):
+    """Return the PNG for ``key``, calling ``draw()`` only on a cache miss.
+
+    ``key`` should identify the page, the chart, its selection and the
+    version of the data it was drawn from.
+    """
+    image = figure_cache.get(key)
+    if image is None:
+        with _draw_lock:
+            image = figure_bytes(draw())
+        figure_cache.put(key, image)
+    return image
+
+
+def draw_price_intervals(ax, summary):
+
+    # seaborn drew 95% bootstrap intervals from the raw rows; the cube only keeps
+    # moments, so draw the normal-approximation interval in the same style
+    ax.errorbar(x=range(len(summary)), y=summary['Price'], yerr=price_ci95(summary), fmt='none', ecolor='#424242', elinewidth=2.25)
+
+
+def country_price_bars(mean_prices, title, price_label=None):
+
+    mean_prices = plain(mean_prices)
+
+    fig, ax = plt.subplots()
+    sns.barplot(x='Country', y='Price', data=mean_prices, ax=ax,color='#FF5A5F')
+
+    # Customize font sizes
+    ax.set_title(title, fontsize=12)
+    ax.set_xlabel("Country", fontsize=10)
+    ax.set_ylabel(price_label or "Average Price", fontsize=10)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+    plt.xticks(rotation=45, ha='right', fontsize=10)
+    plt.yticks(fontsize=8)
+
+    return fig
+
+
+def type_price_bars(summary, x, xlabel, title, price_label=None):
+
+    summary = plain(summary)
+
+    fig, ax = plt.subplots()
+    sns.barplot(x=x, y='Price', data=summary, ax=ax,color='#FF5A5F')
+    if price_label is None:
+        # The intervals are for the mean; quantile bars are drawn without them
+        draw_price_intervals(ax, summary)
+
+    ax.set_title(title, fontsize=12)
+    ax.set_xlabel(xlabel, fontsize=10)
+    ax.set_ylabel(price_label or "Price", fontsize=10)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+    plt.xticks(rotation=45, ha='right', fontsize=10)
+    plt.yticks(fontsize=8)
+
+    return fig
+
+
+def suburb_price_bars(mean_suburb_prices, city, country, price_label=None):
+
+    mean_suburb_prices = plain(mean_suburb_prices)
+
+    # About the original 17 inches for a page of 35 bars, but never taller than the bars need
+    fig, ax = plt.subplots(figsize=(10, 1.5 + 0.45 * max(len(mean_suburb_prices), 1)))
+    sns.barplot(x='Price', y='Suburb', data=mean_suburb_prices, ax=ax,color='#FF5A5F')
+
+    #customise
+    ax.set_title(f"{price_label or 'Average Price'} of Suburbs in {city}({country})", fontsize=16)
+    ax.set_xlabel(price_label or "Average Price", fontsize=14)
+    ax.set_ylabel("Suburbs", fontsize=14)
+    ax.tick_params(axis='both', which='major', labelsize=11.5)
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_visible(True)
+    ax.spines['bottom'].set_visible(False)
+
+    for i in ax.containers:
+        ax.bar_label(i, fmt='%.2f', label_type='edge', fontsize=11.5)
+
+    return fig
+
+
+def price_box_plot(summary, x, title, horizontal=False):
+
+    # Boxes from the sketch quantiles: p25-p75 with the median, whiskers at p10 and p90
+    summary = plain(summary)
+    stats = [{'label': str(label), 'med': median, 'q1': q1, 'q3': q3, 'whislo': low, 'whishi': high}
+             for label, low, q1, median, q3, high in summary[[x, 'p10', 'p25', 'Median', 'p75', 'p90']].itertuples(index=False)]
+
+    size = (10, 1.5 + 0.45 * max(len(stats), 1)) if horizontal else (6.4, 4.8)
+    fig, ax = plt.subplots(figsize=size)
+    ax.bxp(stats, showfliers=False, patch_artist=True, orientation='horizontal' if horizontal else 'vertical',
+           boxprops={'facecolor': '#FF5A5F', 'edgecolor': '#424242'}, medianprops={'color': '#424242', 'linewidth': 2})
+
+    ax.set_title(title, fontsize=12)
+    if horizontal:
+        ax.set_xlabel("Price", fontsize=10)
+        ax.invert_yaxis()
+    else:
+        ax.set_ylabel("Price", fontsize=10)
+        plt.xticks(rotation=45, ha='right', fontsize=10)
+
+    return fig
+
+
+def price_chart(summary, statistic, x, title, bars, horizontal=False):
+    """``bars(data, price_label)`` over the chosen statistic, or a box plot for 'Distribution'."""
+    return _price_chart(summary, statistic, x, title, bars, price_box_plot, horizontal)
+
+
+def correlation_heatmap(correlation_matrix, title):
+
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(correlation_matrix, annot=True, cmap='Blues', linewidths=.5)
+    plt.title(title)
+
+    return fig
+
+
+def superhost_status_bars(counts, x, title, figsize):
+
+    counts = plain(counts)
+
+    fig = plt.figure(figsize=figsize)
+    sns.barplot(data=counts, x=x, y='Count', hue='Super host', palette=SUPERHOST_COLORS)
+    plt.title(title)
+    plt.xlabel(x, fontsize=14)
+    plt.ylabel("Count", fontsize=14)
+    plt.xticks(rotation=90, fontsize=13)
+    for container in plt.gca().containers:
+        plt.gca().bar_label(container)
+
+    return fig
+
+
+def average_price_bars(avg_price, x, title, figsize, tick_size, price_label=None):
+
+    avg_price = plain(avg_price)
+
+    fig = plt.figure(figsize=figsize)
+    sns.barplot(data=avg_price, x=x, y='Price', palette=['#FF5A5F'])
+    plt.title(title, fontsize=16)
+    plt.xlabel(x, fontsize=16)
+    plt.ylabel(price_label or "Average Price", fontsize=16)
+    plt.xticks(rotation=90, fontsize=tick_size)
+    for container in plt.gca().containers:
+        plt.gca().bar_label(container)
+
+    return fig
+
+
+def city_listing_bars(city_data, x, xlabel, title):
+
+    city_data = plain(city_data)
+
+    fig = plt.figure(figsize=(11, 19))
+    sns.barplot(data=city_data, y='City', x=x, palette=['#FF5A5F'])
+    plt.title(title, fontsize=16)
+    plt.xlabel(xlabel, fontsize=14)
+    plt.ylabel("City", fontsize=14)
+    plt.xticks(fontsize=20)
+    plt.yticks(rotation=45,fontsize=20)
+
+    return fig
@@ -0,0 +1,481 @@
+"""Process-wide data access for the Airbnb Streamlit pages.
+
+Streamlit re-executes ``Airbnb_stream.py`` on every rerun, but imported
+modules stay in ``sys.modules`` for the lifetime of the server process. Keeping
+the loaded datasets here means each CSV is parsed once per process and the
+resulting DataFrame is shared by every session. Pages must treat the frames as
+read-only: filter or copy them, never assign into them.
+
+Loaded frames are compacted: the dimension columns (Country, City, Suburb,
+Room type, Property type) become categoricals over one shared, sorted table
+of values per column, and numeric columns are downcast where that loses
+nothing. Group on them with ``observed=True``, and hand plotting libraries
+plain object columns.
+
+With ``pyarrow`` installed, each compacted frame is also written to an
+uncompressed Arrow file in the cache directory and used through a read-only
+memory map: its columns are pages of that file rather than private memory,
+so every session and every worker process on the machine shares one copy,
+and the OS can drop the pages under memory pressure instead of the process
+being killed. Writing into such a frame raises an error.
+
+When a CSV only grew by whole rows (the start and the end of its previous
+contents are unchanged), the appended rows are parsed on their own and
+folded into the loaded frame, and into derived values that know how to
+``update`` themselves. Any other change rebuilds from scratch.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.environ.get('AIRBNB_DATA_DIR', '.')
+CACHE_DIR = os.environ.get('AIRBNB_CACHE_DIR', os.path.join(DATA_DIR, '.airbnb_cache'))
+
+DATASETS = {
+    'Geospatial': 'Geospatial_data.csv',
+    'Price': 'Price_data.csv',
+    'Availability': 'Availability_data.csv',
+    'Corelation': 'Corelation_data.csv',
+    'Superhost': 'Superhost_data.csv',
+}
+
+# name -> (source signature, DataFrame)
+_loaded = {}
+_locks = {name: threading.Lock() for name in DATASETS}
+
+# Dimension column -> sorted Index of its values across every loaded dataset
+DIMENSIONS = ['Country', 'City', 'Suburb', 'Room type', 'Property type']
+_dimensions = {}
+_dimensions_lock = threading.Lock()
+
+# Serve loaded frames from read-only memory-mapped Arrow files (set AIRBNB_MEMORY_MAP=0 to keep them in memory)
+MEMORY_MAP = os.environ.get('AIRBNB_MEMORY_MAP', '1') == '1'
+
+# Rows per Parquet row group; each group's min/max statistics let filtered scans skip it
+PARQUET_ROW_GROUP = 65_536
+
+# (name, signature) -> fingerprint of the CSV as it was at that signature
+FINGERPRINT_BLOCK = 1024 * 1024
+_fingerprints = {}
+
+# name -> {(since, until): appended rows or None}, for the newest version only
+_appends = {}
+_append_locks = {name: threading.Lock() for name in DATASETS}
+
+# token -> (start, end) address of each memory-mapped file a loaded frame reads from
+_mapped_regions = {}
+
+# Reading the umask means setting it, so it is read once, at import, and set straight back
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# (name, key) -> (source signature, value) for indexes and aggregates built from a dataset
+_derived = {}
+_derived_locks = {}
+_derived_locks_guard = threading.Lock()
+
+
+def csv_path(name):
+    return os.path.join(DATA_DIR, DATASETS[name])
+
+
+def source_signature(name):
+    # mtime and size change whenever the export is rewritten or appended to
+    stat = os.stat(csv_path(name))
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_version(name):
+    mtime, size = source_signature(name)
+    return f'{mtime}-{size}'
+
+
+def _prefix_hash(handle, size):
+    # Hash of the first ``size`` bytes, read a block at a time
+    handle.seek(0)
+    digest = hashlib.sha1()
+    remaining = size
+    while remaining > 0:
+        block = handle.read(min(remaining, FINGERPRINT_BLOCK))
+        if not block:
+            break
+        digest.update(block)
+        remaining -= len(block)
+    return digest
+
+
+def _fingerprint(digest, ends_with_newline):
+    return digest.hexdigest(), ends_with_newline
+
+
+def _ends_with_newline(handle, size):
+    if size == 0:
+        return False
+    handle.seek(size - 1)
+    return handle.read(1) == b'\n'
+
+
+def remember_version(name, signature):
+    """Fingerprint the CSV at ``signature`` so later appends to it can be recognised."""
+    if (name, signature) not in _fingerprints:
+        size = signature[1]
+        try:
+            with open(csv_path(name), 'rb') as handle:
+                _fingerprints[(name, signature)] = _fingerprint(_prefix_hash(handle, size), _ends_with_newline(handle, size))
+        except OSError:
+            pass
+
+
+def appended_rows(name, since, until):
+    """The compacted rows added between two versions of a CSV.
+
+    Returns None unless the file at ``until`` is the file at ``since`` plus
+    whole rows: it must have grown, the old contents must have ended with a
+    newline and be byte for byte unchanged (the whole prefix is hashed, so an
+    edited row anywhere means a full rebuild), and the new rows must be
+    complete lines too.
+
+    The loaded frame and every derived value ask for the same append; it is
+    verified and parsed once, and the answer (rows or None) shared. Callers
+    must not modify the rows.
+    """
+    with _append_locks[name]:
+        key = (since, until)
+        if key not in _appends.get(name, {}):
+            # Only the answers for the newest version are kept
+            known = _appends.setdefault(name, {})
+            if any(other_until != until for _, other_until in known):
+                known.clear()
+            known[key] = _read_appended(name, since, until)
+        return _appends[name][key]
+
+
+def _read_appended(name, since, until):
+    fingerprint = _fingerprints.get((name, since))
+    if fingerprint is None or not fingerprint[1] or until[1] <= since[1]:
+        return None
+
+    try:
+        with open(csv_path(name), 'rb') as handle:
+            digest = _prefix_hash(handle, since[1])
+            if _fingerprint(digest, True) != fingerprint:
+                return None
+            appended = handle.read(until[1] - since[1])
+            handle.seek(0)
+            header = handle.readline()
+    except OSError:
+        return None
+    if len(appended) != until[1] - since[1] or not appended.endswith(b'\n'):
+        # A row still being written; read it in full next time
+        return None
+
+    # The new version's fingerprint follows from the old one's hash, without another read
+    digest.update(appended)
+    _fingerprints[(name, until)] = _fingerprint(digest, True)
+
+    df = pd.read_csv(io.BytesIO(header + appended))
+    df.columns = df.columns.str.strip()
+    return compact(df)
+
+
+def _parquet_path(name, signature):
+    mtime, size = signature
+    return os.path.join(CACHE_DIR, f'{name}_{mtime}_{size}.parquet')
+
+
+def _remove_stale(name, keep):
+    # Older copies of the same kind as ``keep``
+    extension = os.path.splitext(keep)[1]
+    for file_name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, file_name)
+        if file_name.startswith(f'{name}_') and file_name.endswith(extension) and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _read_csv(name):
+    df = pd.read_csv(csv_path(name))
+    # Some exports carry padded headers; strip them once here instead of per page
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def _publish(path, write):
+    # ``write(tmp_path)`` into a file only this call uses, then give it its final
+    # name unless another thread or process got there first: a version's file is
+    # never rewritten in place, since other processes may have it mapped
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(handle)
+    try:
+        write(tmp_path)
+        # mkstemp makes the file private; give it the umask's mode like any other
+        # new file, so processes running as other users can read it too
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hard links on this filesystem; a rename still never truncates the other file
+            if not os.path.exists(path):
+                os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_columnar(name, parquet_path, df):
+    try:
+        _publish(parquet_path, lambda tmp_path: df.to_parquet(tmp_path, index=False, row_group_size=PARQUET_ROW_GROUP))
+        _remove_stale(name, parquet_path)
+    except (ImportError, ValueError, OSError):
+        # The columnar copy only speeds up the next process start
+        pass
+
+
+def _read_columnar(name, signature):
+    parquet_path = _parquet_path(name, signature)
+
+    if os.path.exists(parquet_path):
+        try:
+            return pd.read_parquet(parquet_path)
+        except (ImportError, ValueError, OSError):
+            # No parquet engine or a half-written file: fall back to the CSV
+            pass
+
+    df = _read_csv(name)
+    _write_columnar(name, parquet_path, df)
+    return df
+
+
+def parquet_file(name):
+    """Path of the Parquet copy of ``name``'s current CSV, or None if it cannot be written.
+
+    The copy is written here when missing (say, after rows were appended),
+    without loading the dataset into the shared cache.
+    """
+    parquet_path = _parquet_path(name, source_signature(name))
+    if not os.path.exists(parquet_path):
+        with _locks[name]:
+            if not os.path.exists(parquet_path):
+                _write_columnar(name, parquet_path, _read_csv(name))
+    return parquet_path if os.path.exists(parquet_path) else None
+
+
+def _arrow_path(name, signature):
+    mtime, size = signature
+    return os.path.join(CACHE_DIR, f'{name}_{mtime}_{size}.arrow')
+
+
+def _write_mapped(name, path, df):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    _publish(path, write)
+    _remove_stale(name, path)
+
+
+def _read_mapped(path):
+    import pyarrow as pa
+
+    # split_blocks keeps each column on its own buffer, so columns without
+    # missing values stay views of the mapped file instead of being copied
+    source = pa.memory_map(path, 'r')
+    region = source.read_buffer(source.size())
+    source.seek(0)
+    df = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+    # The file's address range, for telling mapped columns from copies, while the frame lives
+    token = object()
+    _mapped_regions[token] = (region.address, region.address + region.size)
+    weakref.finalize(df, _mapped_regions.pop, token, None)
+    for column in df.columns:
+        if column in DIMENSIONS and isinstance(df[column].dtype, pd.CategoricalDtype):
+            categories = df[column].cat.categories
+            table = dimension_table(column, categories)
+            if table.equals(categories):
+                # Same values in the same order: keep the mapped codes, use the shared Index
+                df[column] = pd.Categorical.from_codes(df[column].cat.codes.to_numpy(), dtype=pd.CategoricalDtype(table))
+            else:
+                df[column] = df[column].cat.set_categories(table)
+    return df
+
+
+def is_mapped(values):
+    """Whether the numpy array ``values`` lies in a memory-mapped dataset file."""
+    address = values.__array_interface__['data'][0]
+    return any(start <= address and address + values.nbytes <= end for start, end in list(_mapped_regions.values()))
+
+
+def _mapped(name, signature, df):
+    # ``df`` as a view of its Arrow file, or ``df`` itself if the file cannot be written
+    if not MEMORY_MAP:
+        return df
+    try:
+        path = _arrow_path(name, signature)
+        _write_mapped(name, path, df)
+        return _read_mapped(path)
+    except (ImportError, ValueError, TypeError, OSError):
+        return df
+
+
+def _load_full(name, signature):
+    if MEMORY_MAP:
+        path = _arrow_path(name, signature)
+        if os.path.exists(path):
+            try:
+                return _read_mapped(path)
+            except (ImportError, ValueError, TypeError, OSError):
+                pass
+    return _mapped(name, signature, compact(_read_columnar(name, signature)))
+
+
+def dimension_table(column, values=()):
+    """The shared categories for ``column``, extended with any new ``values``.
+
+    Datasets whose values are all known reuse the same Index object, so the
+    strings are held once and codes mean the same value in every dataset.
+    """
+    values = pd.Index(values).dropna().unique()
+    with _dimensions_lock:
+        table = _dimensions.get(column)
+        if table is None:
+            table = pd.Index([], dtype=object)
+        new = values[~values.isin(table)]
+        if len(new):
+            table = table.append(new)
+            try:
+                # Sorted, so groupby(sort=True) on the codes orders like the strings
+                table = table.sort_values()
+            except TypeError:
+                pass
+        _dimensions[column] = table
+        return table
+
+
+def _downcast(values):
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.to_numeric(values, downcast='integer')
+    if pd.api.types.is_float_dtype(values.dtype) and values.dtype != np.float32:
+        # Only when every value survives the round trip (whole prices, ratings, scores)
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(dtype=np.float64), values.to_numpy(), equal_nan=True):
+            return narrow
+    return values
+
+
+def compact(df):
+    """``df`` with shared categorical dimensions and downcast numeric columns."""
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in DIMENSIONS and values.dtype == object:
+            columns[column] = pd.Categorical(values, categories=dimension_table(column, values.unique()))
+        else:
+            columns[column] = _downcast(values)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def concat_frames(frames):
+    """Concatenate compacted frames, moving their dimensions onto the current shared tables."""
+    aligned = []
+    for frame in frames:
+        categories = {column: frame[column].cat.set_categories(dimension_table(column)) for column in frame.columns
+                      if column in DIMENSIONS and isinstance(frame[column].dtype, pd.CategoricalDtype)}
+        aligned.append(frame.assign(**categories) if categories else frame)
+    return pd.concat(aligned, ignore_index=True)
+
+
+def load_dataset(name):
+    """Return the shared DataFrame for ``name``, reloading it only if its CSV changed."""
+    signature = source_signature(name)
+
+    with _locks[name]:
+        cached = _loaded.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        rows = appended_rows(name, cached[0], signature) if cached is not None else None
+        if rows is not None:
+            df = _mapped(name, signature, concat_frames([cached[1], rows]))
+        else:
+            df = _load_full(name, signature)
+        remember_version(name, signature)
+        _loaded[name] = (signature, df)
+        return df
+
+
+def read_csv_chunks(name, columns, chunksize=100_000):
+    """Yield ``columns`` of a dataset's CSV in chunks, without loading the whole file."""
+    wanted = set(columns)
+    chunks = pd.read_csv(csv_path(name), usecols=lambda column: column.strip() in wanted, chunksize=chunksize)
+    for chunk in chunks:
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk
+
+
+def cached_derived(name, key, build, update=None):
+    """Return ``build()`` computed once per version of dataset ``name``.
+
+    Concurrent callers asking for the same ``(name, key)`` wait for the first
+    build instead of repeating it. When the dataset only had rows appended,
+    ``update(previous value, appended rows)`` is used instead of ``build()``;
+    it must return a new value and leave the previous one untouched.
+    """
+    with _derived_locks_guard:
+        lock = _derived_locks.setdefault((name, key), threading.Lock())
+
+    with lock:
+        signature = source_signature(name)
+        cached = _derived.get((name, key))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        value = None
+        if cached is not None and update is not None:
+            rows = appended_rows(name, cached[0], signature)
+            if rows is not None:
+                value = update(cached[1], rows)
+        if value is None:
+            value = build()
+
+        remember_version(name, signature)
+        _derived[(name, key)] = (signature, value)
+        return value
+
+
+def cached_items():
+    """``(dataset, key, value)`` for each loaded frame (key None) and derived value."""
+    items = [(name, None, df) for name, (_, df) in list(_loaded.items())]
+    items += [(name, key, value) for (name, key), (_, value) in list(_derived.items())]
+    return items
+
+
+def dimension_tables():
+    with _dimensions_lock:
+        return dict(_dimensions)
+
+
+def clear_cache():
+    for name in DATASETS:
+        with _locks[name]:
+            _loaded.pop(name, None)
+    _derived.clear()
+    _dimensions.clear()
+    _fingerprints.clear()
+    _appends.clear()
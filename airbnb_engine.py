@@ -0,0 +1,125 @@
+"""Optional SQL engine for filter-and-aggregate queries over the Parquet copies.
+
+Start the app (or ``airbnb_api.py``) with ``AIRBNB_ENGINE=duckdb`` to run
+the city availability sums and the API's availability and host queries in
+DuckDB, straight against the Parquet
+copy of each CSV: only the columns a query names are read, and row groups
+whose statistics rule out its filters are skipped. Results have the same
+columns, order and measure types as the pandas code they replace; grouping
+columns come back as plain strings where that code keeps them categorical.
+
+Without ``duckdb`` installed the same queries run through pandas, still
+pushing the column list and filters down to the Parquet reader, and without
+a Parquet engine they fall back to the loaded DataFrame.
+"""
+
+import os
+
+import pandas as pd
+
+import airbnb_data
+
+ENGINE = os.environ.get('AIRBNB_ENGINE', 'pandas')
+
+# Aggregate name -> SQL, for measures given as (column, aggregate)
+SQL_AGGREGATES = {'sum': 'SUM({})', 'mean': 'AVG({})', 'count': 'COUNT({})', 'size': 'COUNT(*)'}
+
+
+def engine_enabled():
+    return ENGINE == 'duckdb'
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sql(path, by, measures, where, exclude, integers):
+    selects = [_quote(column) for column in by]
+    for name, (column, aggregate) in measures.items():
+        expression = SQL_AGGREGATES[aggregate].format(_quote(column))
+        if aggregate in ('count', 'size') or (aggregate == 'sum' and column in integers):
+            # DuckDB sums integers as HUGEINT; pandas gives int64
+            expression = f'CAST({expression} AS BIGINT)'
+        selects.append(f'{expression} AS {_quote(name)}')
+
+    conditions, params = [], []
+    for column, value in where.items():
+        conditions.append(f'{_quote(column)} = ?')
+        params.append(value)
+    for column, values in exclude.items():
+        conditions.append(f"{_quote(column)} NOT IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    # groupby drops groups with a missing key
+    conditions.extend(f'{_quote(column)} IS NOT NULL' for column in by)
+
+    path = path.replace("'", "''")
+    sql = f"SELECT {', '.join(selects)} FROM read_parquet('{path}')"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    if by:
+        group = ', '.join(_quote(column) for column in by)
+        sql += f' GROUP BY {group} ORDER BY {group}'
+    return sql, params
+
+
+def _integer_columns(path):
+    import pyarrow.parquet as pq
+    import pyarrow.types as pa_types
+
+    return {field.name for field in pq.read_schema(path) if pa_types.is_integer(field.type)}
+
+
+def _pandas_aggregate(name, path, by, measures, where, exclude):
+    columns = list(dict.fromkeys(list(by) + [column for column, _ in measures.values()] + list(where) + list(exclude)))
+    if path is not None:
+        filters = [(column, '==', value) for column, value in where.items()]
+        filters += [(column, 'not in', list(values)) for column, values in exclude.items()]
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+    else:
+        df = airbnb_data.load_dataset(name)[columns]
+        for column, value in where.items():
+            df = df[df[column] == value]
+        for column, values in exclude.items():
+            df = df[~df[column].isin(values)]
+
+    # The loaded frames are downcast; sum their integers in 64 bits like DuckDB does
+    summed = {column for column, aggregate in measures.values() if aggregate == 'sum'}
+    df = df.astype({column: 'int64' for column in summed if pd.api.types.is_integer_dtype(df[column].dtype)})
+
+    if not by:
+        # One row over everything that passed the filters, as SQL gives
+        return pd.DataFrame([{name: len(df) if function == 'size' else df[column].agg(function)
+                              for name, (column, function) in measures.items()}])
+    if df.empty:
+        return pd.DataFrame(columns=list(by) + list(measures))
+    return df.groupby(list(by), observed=True).agg(**measures).reset_index()
+
+
+def aggregate(name, by, measures, where=None, exclude=None):
+    """Group dataset ``name`` by ``by`` and compute ``measures``, sorted by ``by``.
+
+    ``measures`` maps each output column to ``(column, aggregate)`` with the
+    aggregate one of sum, mean, count or size, as in ``DataFrame.agg``.
+    ``where`` maps columns to the single value they must equal and
+    ``exclude`` maps columns to values they must not take. With an empty
+    ``by`` the result is a single row over every matching listing.
+    """
+    where = where or {}
+    exclude = exclude or {}
+    path = airbnb_data.parquet_file(name)
+
+    duckdb = _duckdb()
+    if duckdb is None or path is None:
+        return _pandas_aggregate(name, path, by, measures, where, exclude)
+
+    sql, params = _sql(path, by, measures, where, exclude, _integer_columns(path))
+    with duckdb.connect() as connection:
+        return connection.execute(sql, params).df()
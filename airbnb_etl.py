@@ -0,0 +1,241 @@
+"""Build the five app datasets from a raw Airbnb listings dump.
+
+    python airbnb_etl.py listingsAndReviews.json --out-dir . --workers 8
+
+The input is a ``sample_airbnb.listingsAndReviews`` export: one JSON document
+per line (mongoexport's default) or a single JSON array. The dump is read once.
+Batches of lines are parsed and flattened in a process pool, with only a few
+batches in flight, so memory stays bounded however large the dump is. The
+CSVs are swapped into place when complete, and their columnar copies (see
+airbnb_data) are built so the app starts from them.
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+import airbnb_data
+
+COLUMNS = {
+    'Geospatial': ['Country', 'City', 'Suburb', 'Price', 'Rating', 'Room type', 'Longitude', 'Latitude'],
+    'Price': ['Country', 'City', 'Suburb', 'Room type', 'Property type', 'Price'],
+    'Availability': ['Country', 'City', 'next 30', 'next 60', 'next 90', 'next 365'],
+    'Corelation': ['Price', 'Rating', 'Minimum nights', 'Maximum nights', 'Bedroom count', 'Bathroom count',
+                   'Super host', 'Review count', 'Cleanliness score', 'Communication score', 'Location score',
+                   'Pricevalue score'],
+    'Superhost': ['Country', 'City', 'Super host', 'Price', 'Host Listings'],
+}
+
+
+def _number(value):
+    # mongoexport writes Decimal128, int64 and doubles as {"$numberDecimal": "80.00"} and similar.
+    # Integers stay int, so counts are written as 5 rather than 5.0 like the existing exports.
+    if isinstance(value, dict):
+        for key in ('$numberInt', '$numberLong'):
+            if key in value:
+                try:
+                    return int(value[key])
+                except (TypeError, ValueError):
+                    return None
+        for key in ('$numberDecimal', '$numberDouble'):
+            if key in value:
+                try:
+                    return float(value[key])
+                except (TypeError, ValueError):
+                    return None
+        return None
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('+-').isdigit():
+        # Some counts, like minimum_nights, are exported as strings
+        return int(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _frame(rows, columns):
+    # Built as objects so ints next to missing values are not turned into floats;
+    # columns holding only ints are written through the nullable Int64 type
+    frame = pd.DataFrame(rows, columns=columns, dtype=object)
+    for column in columns:
+        values = frame[column].dropna()
+        if len(values) and values.map(_is_integer).all():
+            frame[column] = frame[column].astype('Int64')
+    return frame
+
+
+def flatten(listing):
+    """One listing document as a row for each of the five datasets."""
+    address = listing.get('address') or {}
+    host = listing.get('host') or {}
+    scores = listing.get('review_scores') or {}
+    availability = listing.get('availability') or {}
+    coordinates = (address.get('location') or {}).get('coordinates') or [None, None]
+
+    country = address.get('country')
+    city = address.get('market')
+    suburb = address.get('suburb') or address.get('government_area')
+    price = _number(listing.get('price'))
+    rating = _number(scores.get('review_scores_rating'))
+    super_host = host.get('host_is_superhost')
+
+    return {
+        # The existing exports keep the latitude under 'Longitude' and the
+        # longitude under 'Latitude'; the map pages rely on that layout
+        'Geospatial': (country, city, suburb, price, rating, listing.get('room_type'),
+                       _number(coordinates[1]), _number(coordinates[0])),
+        'Price': (country, city, suburb, listing.get('room_type'), listing.get('property_type'), price),
+        'Availability': (country, city,
+                         _number(availability.get('availability_30')), _number(availability.get('availability_60')),
+                         _number(availability.get('availability_90')), _number(availability.get('availability_365'))),
+        'Corelation': (price, rating, _number(listing.get('minimum_nights')), _number(listing.get('maximum_nights')),
+                       _number(listing.get('bedrooms')), _number(listing.get('bathrooms')), super_host,
+                       _number(listing.get('number_of_reviews')), _number(scores.get('review_scores_cleanliness')),
+                       _number(scores.get('review_scores_communication')), _number(scores.get('review_scores_location')),
+                       _number(scores.get('review_scores_value'))),
+        'Superhost': (country, city, super_host, price, _number(host.get('host_total_listings_count'))),
+    }
+
+
+def _to_csv(documents):
+    # Runs in a worker: flatten a batch and return CSV text (no header) per dataset
+    rows = {name: [] for name in COLUMNS}
+    for document in documents:
+        for name, row in flatten(document).items():
+            rows[name].append(row)
+    return {name: _frame(rows[name], COLUMNS[name]).to_csv(index=False, header=False)
+            for name in COLUMNS}
+
+
+def convert_lines(lines):
+    return _to_csv(json.loads(line) for line in lines if line.strip())
+
+
+def convert_documents(documents):
+    return _to_csv(documents)
+
+
+def _json_array(handle, read_size=1 << 20):
+    # Stream the elements of a top-level JSON array without loading the whole file
+    decoder = json.JSONDecoder()
+    buffer = handle.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('expected a JSON array or one JSON document per line')
+    position = 1
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        try:
+            document, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            more = handle.read(read_size)
+            if not more:
+                raise
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+        yield document
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run(source, out_dir, workers=None, batch_size=2000):
+    """Write the five datasets for ``source`` into ``out_dir``; returns the listing count."""
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    tmp_paths = {name: os.path.join(out_dir, airbnb_data.DATASETS[name] + '.tmp') for name in COLUMNS}
+    outputs = {name: open(path, 'w', newline='') for name, path in tmp_paths.items()}
+    listings = 0
+
+    try:
+        for name, output in outputs.items():
+            output.write(','.join(COLUMNS[name]) + '\n')
+
+        with open(source) as handle:
+            first = handle.read(1)
+            while first.isspace():
+                first = handle.read(1)
+            handle.seek(0)
+
+            # JSON lines are parsed in the workers; an array has to be split by parsing it here
+            if first == '[':
+                batches, convert = _batches(_json_array(handle), batch_size), convert_documents
+            else:
+                batches, convert = _batches(handle, batch_size), convert_lines
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Keep a couple of batches per worker in flight and write results in input order
+                pending = deque()
+                for batch in batches:
+                    pending.append((len(batch), pool.submit(convert, batch)))
+                    if len(pending) >= 2 * workers:
+                        listings += _write(outputs, *pending.popleft())
+                while pending:
+                    listings += _write(outputs, *pending.popleft())
+    finally:
+        for output in outputs.values():
+            output.close()
+
+    for name, path in tmp_paths.items():
+        os.replace(path, os.path.join(out_dir, airbnb_data.DATASETS[name]))
+
+    return listings
+
+
+def _write(outputs, size, future):
+    for name, text in future.result().items():
+        outputs[name].write(text)
+    return size
+
+
+def build_columnar(out_dir):
+    # Loading each dataset once writes its columnar copy next to the CSVs
+    airbnb_data.DATA_DIR = out_dir
+    airbnb_data.CACHE_DIR = os.path.join(out_dir, '.airbnb_cache')
+    airbnb_data.clear_cache()
+    for name in airbnb_data.DATASETS:
+        airbnb_data.load_dataset(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='listings dump (JSON lines or a JSON array)')
+    parser.add_argument('--out-dir', default=airbnb_data.DATA_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--batch-size', type=int, default=2000, help='listings per worker task')
+    parser.add_argument('--skip-columnar', action='store_true', help='only write the CSVs')
+    args = parser.parse_args()
+
+    listings = run(args.source, args.out_dir, args.workers, args.batch_size)
+    print(f'Wrote {listings} listings to {len(COLUMNS)} datasets in {args.out_dir}')
+
+    if not args.skip_columnar:
+        build_columnar(args.out_dir)
+        print(f'Built columnar copies in {airbnb_data.CACHE_DIR}')
+
+
+if __name__ == '__main__':
+    main()
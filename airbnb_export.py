@@ -0,0 +1,221 @@
+"""Render every chart of the pricing, neighbourhood and host pages to files.
+
+    python airbnb_export.py --out-dir exports --formats png svg html --workers 8
+
+Each selection a page offers (every room type, property type, country and
+city) becomes one file per format under ``<out-dir>/<page>/<chart>/``. The
+charts are drawn by the same builders the app uses, in a process pool.
+Runs are incremental: ``manifest.json`` records a hash of each chart's input
+table and builder code, and outputs whose hash is unchanged are skipped.
+
+Matplotlib charts are written as PNG or SVG, and as an HTML page embedding
+the SVG. Plotly charts are written as HTML, and as PNG/SVG when kaleido is
+installed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import airbnb_data
+
+FORMATS = ['png', 'svg', 'html']
+
+PAGES = ['pricing', 'neighbourhood', 'hosts']
+
+# The builders live here, so a change to any of them invalidates every output
+CHARTS_SOURCES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+                  for file_name in ('airbnb_charts.py', 'airbnb_chart_common.py')]
+
+
+def _job(page, chart, selection, builder, data, *args):
+    return {'page': page, 'chart': chart, 'selection': selection, 'builder': builder, 'data': data, 'args': args}
+
+
+def pricing_jobs():
+    from airbnb_aggregates import city_availability, price_cube
+
+    cube = price_cube()
+    for room_type in cube.values('Room type'):
+        mean_prices = cube.rollup(['Country'], {'Room type': room_type}, sort=True)
+        yield _job('pricing', 'room type', room_type, 'country_price_bars', mean_prices, f"Prices of {room_type}")
+    for country in cube.values('Country'):
+        summary = cube.rollup(['Room type'], {'Country': country})
+        yield _job('pricing', 'room types in country', country, 'type_price_bars', summary,
+                   'Room type', "Room Type", f"Room Prices by Type in {country}")
+    for property_type in cube.values('Property type'):
+        mean_prices = cube.rollup(['Country'], {'Property type': property_type}, sort=True)
+        yield _job('pricing', 'property type', property_type, 'country_price_bars', mean_prices, f"Prices of {property_type}")
+    for country in cube.values('Country'):
+        summary = cube.rollup(['Property type'], {'Country': country})
+        yield _job('pricing', 'property types in country', country, 'type_price_bars', summary,
+                   'Property type', "Property Type", f"Property Prices by Type in {country}")
+    yield _job('pricing', 'availability', 'all cities', 'availability_bars', city_availability())
+
+
+def neighbourhood_jobs():
+    from airbnb_aggregates import price_cube
+
+    # One chart per city with every suburb, most expensive first
+    cube = price_cube()
+    for country in cube.values('Country'):
+        for city in cube.values('City', {'Country': country}):
+            suburbs = cube.rollup(['Suburb'], {'Country': country, 'City': city}, sort=True)
+            suburbs = suburbs.sort_values(by='Price', ascending=False, kind='stable')
+            yield _job('neighbourhood', 'suburbs', f'{country} - {city}', 'suburb_price_bars', suburbs, city, country)
+
+
+def host_jobs():
+    from airbnb_aggregates import host_insights
+
+    insights = host_insights()
+    yield _job('hosts', 'superhost by country', 'all', 'superhost_status_bars', insights['country_counts'],
+               'Country', "Superhost Status by Country", (8, 7))
+    yield _job('hosts', 'average price by country', 'all', 'average_price_bars', insights['country_avg_price'],
+               'Country', "Average Price by Country", (8, 13), 18)
+    yield _job('hosts', 'superhost by city', 'all', 'superhost_status_bars', insights['city_counts'],
+               'City', "Superhost Status by City", (8, 6))
+    yield _job('hosts', 'average price by city', 'all', 'average_price_bars', insights['city_avg_price'],
+               'City', "Average Price by City", (8, 12), 16)
+    yield _job('hosts', 'average host listings by city', 'all', 'city_listing_bars', insights['city_avg_listings'],
+               'Host Listings', "Average Listings per Host", "Average Listings per Host by City")
+    yield _job('hosts', 'listing count by city', 'all', 'city_listing_bars', insights['city_listing_counts'],
+               'Listing Count', "Listing Count", "Listing Count by City")
+    yield _job('hosts', 'listings per host vs total', 'all', 'listings_scatter', insights['merged_data'])
+
+
+PAGE_JOBS = {'pricing': pricing_jobs, 'neighbourhood': neighbourhood_jobs, 'hosts': host_jobs}
+
+
+def _slug(value):
+    return re.sub(r'[^\w.-]+', '_', str(value)).strip('_') or '_'
+
+
+def output_path(out_dir, job, format):
+    return os.path.join(out_dir, job['page'], _slug(job['chart']), f"{_slug(job['selection'])}.{format}")
+
+
+def input_hash(job, format, code_hash):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([job['builder'], job['args'], format, code_hash], default=str).encode())
+    digest.update(pd.util.hash_pandas_object(job['data'], index=False).to_numpy().tobytes())
+    digest.update(json.dumps(list(map(str, job['data'].columns))).encode())
+    return digest.hexdigest()
+
+
+def _is_plotly(builder):
+    return builder in ('availability_bars', 'listings_scatter')
+
+
+def render(job, format, path):
+    """Draw one chart and write it to ``path`` (runs in a worker process)."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import airbnb_charts
+
+    fig = getattr(airbnb_charts, job['builder'])(job['data'], *job['args'])
+    tmp_path = path + '.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if _is_plotly(job['builder']):
+        if format == 'html':
+            fig.write_html(tmp_path, include_plotlyjs='cdn')
+        else:
+            fig.write_image(tmp_path, format=format)
+    elif format == 'html':
+        svg = airbnb_charts.figure_bytes(fig, format='svg').decode()
+        with open(tmp_path, 'w') as handle:
+            handle.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{job['chart']}: {job['selection']}</title>"
+                         f"</head><body>\n{svg}\n</body></html>\n")
+    else:
+        with open(tmp_path, 'wb') as handle:
+            handle.write(airbnb_charts.figure_bytes(fig, format=format))
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def _formats_for(job, formats, can_write_images):
+    # Plotly needs kaleido for static images; without it those charts are HTML only
+    if _is_plotly(job['builder']) and not can_write_images:
+        return [format for format in formats if format == 'html']
+    return formats
+
+
+def export(out_dir, formats=FORMATS, pages=PAGES, workers=None, force=False):
+    """Render every changed chart; returns ``(written, skipped)`` counts."""
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    # Loaded even when forcing, so the pages not rendered this run keep their entries
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as handle:
+            manifest = json.load(handle)
+
+    code = hashlib.sha256()
+    for path in CHARTS_SOURCES:
+        with open(path, 'rb') as handle:
+            code.update(handle.read())
+    code_hash = code.hexdigest()
+    try:
+        import kaleido  # noqa: F401
+        can_write_images = True
+    except ImportError:
+        can_write_images = False
+
+    # The aggregates are built once here; workers only get the small chart tables
+    tasks = []
+    skipped = 0
+    for page in pages:
+        for job in PAGE_JOBS[page]():
+            for format in _formats_for(job, formats, can_write_images):
+                path = output_path(out_dir, job, format)
+                key = os.path.relpath(path, out_dir)
+                digest = input_hash(job, format, code_hash)
+                if not force and manifest.get(key) == digest and os.path.exists(path):
+                    skipped += 1
+                    continue
+                tasks.append((job, format, path, key, digest))
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(key, digest, pool.submit(render, job, format, path)) for job, format, path, key, digest in tasks]
+        try:
+            for key, digest, future in futures:
+                print(future.result())
+                manifest[key] = digest
+                written += 1
+        finally:
+            # Whatever finished is recorded, so an interrupted run resumes where it stopped
+            os.makedirs(out_dir, exist_ok=True)
+            with open(manifest_path + '.tmp', 'w') as handle:
+                json.dump(manifest, handle, indent=1, sort_keys=True)
+            os.replace(manifest_path + '.tmp', manifest_path)
+
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out-dir', default='exports')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['png'])
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--force', action='store_true', help='render everything, even charts the manifest says are up to date')
+    parser.add_argument('--data-dir', help='directory with the five CSVs (default: AIRBNB_DATA_DIR or .)')
+    args = parser.parse_args()
+
+    if args.data_dir:
+        airbnb_data.DATA_DIR = args.data_dir
+        airbnb_data.CACHE_DIR = os.path.join(args.data_dir, '.airbnb_cache')
+    written, skipped = export(args.out_dir, args.formats, args.pages, args.workers, args.force)
+    print(f'Wrote {written} charts to {args.out_dir}, {skipped} unchanged')
+
+
+if __name__ == '__main__':
+    main()
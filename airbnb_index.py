@@ -0,0 +1,227 @@
+"""Indexes over the Geospatial listings used by the map page."""
+
+import numpy as np
+import pandas as pd
+
+from airbnb_data import cached_derived, load_dataset
+
+# The pages hand [Longitude, Latitude] to folium as its [lat, lon] pair, so the
+# grid keeps the same column order for its two axes.
+POINT_COLUMNS = ['Longitude', 'Latitude']
+
+# Heatmap grid levels: a level-n cell is 360 / 2**n degrees wide
+HEAT_LEVELS = list(range(4, 13))
+HEAT_DIMENSIONS = ['Country', 'Room type']
+
+
+# Viewport lookups bucket listings into square grid cells this many degrees wide
+VIEWPORT_CELL = 0.5
+
+
+class SpatialGrid:
+    """Listings bucketed by grid cell over the two POINT_COLUMNS axes.
+
+    Rows are sorted by cell key (row-major over the first axis), so the cells
+    of a rectangle are one contiguous key range per first-axis column: a
+    viewport lookup is two searchsorted calls per column, then an exact bounds
+    check on the rows of the edge cells.
+    """
+
+    def __init__(self, first, second, cell=VIEWPORT_CELL):
+        self.first = first
+        self.second = second
+        self.cell = cell
+
+        located = np.flatnonzero(~(np.isnan(first) | np.isnan(second)))
+        x = np.floor(first[located] / cell).astype(np.int64)
+        y = np.floor(second[located] / cell).astype(np.int64)
+        self.x0 = int(x.min()) if len(x) else 0
+        self.y0 = int(y.min()) if len(y) else 0
+        self.nx = int(x.max()) - self.x0 + 1 if len(x) else 0
+        self.ny = int(y.max()) - self.y0 + 1 if len(y) else 0
+
+        keys = (x - self.x0) * self.ny + (y - self.y0)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.order = located[order]
+
+    def _span(self, low, high, origin, size):
+        start = max(int(np.floor(low / self.cell)) - origin, 0)
+        end = min(int(np.floor(high / self.cell)) - origin, size - 1)
+        return start, end
+
+    def predicate(self, bounds):
+        """``(size, candidates(), keep(rows))`` for the rectangle ``((low, low), (high, high))``."""
+        (low_first, low_second), (high_first, high_second) = bounds
+        x_start, x_end = self._span(low_first, high_first, self.x0, self.nx)
+        y_start, y_end = self._span(low_second, high_second, self.y0, self.ny)
+
+        # First key of each first-axis column the rectangle crosses
+        columns = np.arange(x_start, x_end + 1) * self.ny
+        if y_start > y_end:
+            columns = columns[:0]
+        starts = np.searchsorted(self.keys, columns + y_start, side='left')
+        ends = np.searchsorted(self.keys, columns + y_end, side='right')
+
+        def keep(rows):
+            first, second = self.first[rows], self.second[rows]
+            return (first >= low_first) & (first <= high_first) & (second >= low_second) & (second <= high_second)
+
+        def candidates():
+            rows = np.concatenate([self.order[start:end] for start, end in zip(starts, ends)] or [np.empty(0, dtype=np.intp)])
+            return rows[keep(rows)]
+
+        return int((ends - starts).sum()), candidates, keep
+
+
+def _category_postings(series):
+    # Sorted row positions per distinct value; factorize codes missing values as -1
+    codes, values = pd.factorize(series)
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.searchsorted(codes[order], np.arange(len(values) + 1))
+    postings = [order[start:end] for start, end in zip(boundaries[:-1], boundaries[1:])]
+    return {value: code for code, value in enumerate(values)}, codes, postings
+
+
+class FilterIndex:
+    """Row-position index over the Geospatial filter columns.
+
+    Country and Room type keep a sorted row list per value, Price and Rating a
+    sorted copy of the column, and the map coordinates a SpatialGrid. A lookup
+    starts from the most selective predicate and only checks the remaining
+    ones against those rows.
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+        self.country = _category_postings(df['Country'])
+        self.room_type = _category_postings(df['Room type'])
+        self.countries = list(self.country[0])
+        self.room_types = list(self.room_type[0])
+
+        self.price = df['Price'].to_numpy(dtype=float)
+        self.rating = df['Rating'].to_numpy(dtype=float)
+        # argsort places missing values last, where no range lookup reaches them
+        self.price_order = np.argsort(self.price, kind='stable')
+        self.rating_order = np.argsort(self.rating, kind='stable')
+        self.sorted_price = self.price[self.price_order]
+        self.sorted_rating = self.rating[self.rating_order]
+
+        self.grid = SpatialGrid(*(df[column].to_numpy(dtype=float) for column in POINT_COLUMNS))
+
+        self.price_bounds = (df['Price'].min(), df['Price'].max())
+        self.rating_bounds = (df['Rating'].min(), df['Rating'].max())
+
+    @staticmethod
+    def _category(column, selected):
+        positions, codes, postings = column
+        selected_codes = [positions[value] for value in selected if value in positions]
+
+        # One extra False slot so the -1 code of missing values never matches
+        wanted = np.zeros(len(postings) + 1, dtype=bool)
+        wanted[selected_codes] = True
+
+        def candidates():
+            return np.concatenate([postings[code] for code in selected_codes] or [np.empty(0, dtype=np.intp)])
+
+        def keep(rows):
+            return wanted[codes[rows]]
+
+        return sum(len(postings[code]) for code in selected_codes), candidates, keep
+
+    @staticmethod
+    def _range(values, order, sorted_values, low, high):
+        start = np.searchsorted(sorted_values, low, side='left')
+        end = np.searchsorted(sorted_values, high, side='right')
+
+        def candidates():
+            return order[start:max(end, start)]
+
+        def keep(rows):
+            return (values[rows] >= low) & (values[rows] <= high)
+
+        return max(end - start, 0), candidates, keep
+
+    def rows(self, countries, room_types, price_range, rating_range, bounds=None):
+        """Sorted row positions of listings matching the filter panel.
+
+        As on the page, an empty room type selection does not filter.
+        ``bounds`` optionally limits the rows to a map viewport, given as
+        ``((low, low), (high, high))`` in POINT_COLUMNS order.
+        """
+        predicates = [
+            self._category(self.country, countries),
+            self._range(self.price, self.price_order, self.sorted_price, *price_range),
+            self._range(self.rating, self.rating_order, self.sorted_rating, *rating_range),
+        ]
+        if room_types:
+            predicates.append(self._category(self.room_type, room_types))
+        if bounds is not None:
+            predicates.append(self.grid.predicate(bounds))
+
+        predicates.sort(key=lambda predicate: predicate[0])
+
+        rows = predicates[0][1]()
+        for _, _, keep in predicates[1:]:
+            if not len(rows):
+                break
+            rows = rows[keep(rows)]
+
+        return np.sort(rows)
+
+    def filter(self, countries, room_types, price_range, rating_range, bounds=None):
+        return self.df.take(self.rows(countries, room_types, price_range, rating_range, bounds))
+
+
+def filter_index():
+    return cached_derived('Geospatial', 'filter index', lambda: FilterIndex(load_dataset('Geospatial')))
+
+
+def cell_size(level):
+    return 360.0 / 2 ** level
+
+
+def bin_points(df, level, by=()):
+    # Count listings and sum prices per grid cell (and per ``by`` group)
+    df = df.dropna(subset=POINT_COLUMNS)
+    size = cell_size(level)
+
+    cells = pd.DataFrame({column: df[column] for column in by}, index=df.index)
+    cells['cell_0'] = np.floor((df[POINT_COLUMNS[0]].to_numpy(dtype=float) + 180) / size).astype(np.int64)
+    cells['cell_1'] = np.floor((df[POINT_COLUMNS[1]].to_numpy(dtype=float) + 180) / size).astype(np.int64)
+    cells['Price'] = df['Price'].astype(float)
+
+    return cells.groupby(list(by) + ['cell_0', 'cell_1'], sort=False, dropna=False, observed=True).agg(
+        Count=('Price', 'size'),
+        Price_sum=('Price', 'sum'),
+        Price_count=('Price', 'count'),
+    ).reset_index()
+
+
+def _build_heat_pyramid():
+    # Listings without a price or rating never pass the page's range filters
+    Geospatial_df = load_dataset('Geospatial').dropna(subset=['Price', 'Rating'])
+    return {level: bin_points(Geospatial_df, level, by=HEAT_DIMENSIONS) for level in HEAT_LEVELS}
+
+
+def heat_pyramid():
+    """Per-level grid cells with listing counts and price sums per Country and Room type."""
+    return cached_derived('Geospatial', 'heat pyramid', _build_heat_pyramid)
+
+
+def heat_cells(cells, level, countries=None, room_types=None):
+    # Merge the pre-binned cells of the selected groups into one row per cell
+    if countries is not None:
+        cells = cells[cells['Country'].isin(countries)]
+    if room_types:
+        cells = cells[cells['Room type'].isin(room_types)]
+
+    cells = cells.groupby(['cell_0', 'cell_1'], sort=False)[['Count', 'Price_sum', 'Price_count']].sum().reset_index()
+
+    size = cell_size(level)
+    cells[POINT_COLUMNS[0]] = (cells['cell_0'] + 0.5) * size - 180
+    cells[POINT_COLUMNS[1]] = (cells['cell_1'] + 0.5) * size - 180
+    cells['Mean price'] = cells['Price_sum'] / cells['Price_count'].where(cells['Price_count'] > 0)
+
+    return cells[POINT_COLUMNS + ['Count', 'Mean price']]
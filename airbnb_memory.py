@@ -0,0 +1,208 @@
+"""Memory accounting for the datasets, caches and sessions of the app process.
+
+Datasets and their aggregates are shared by every session (see
+``airbnb_data``); what a session adds are the images and samples it puts in
+the shared caches. The ``ledger`` charges each of those to the sessions using
+it. Once a session's artefacts pass ``SESSION_MEMORY_BUDGET``, its least
+recently used ones are released and leave their cache unless another session
+still holds them. A session stops being charged for the previous page's
+artefacts when it navigates, and for all of them once idle for
+``SESSION_IDLE_SECONDS``; those stay cached for later visitors until the
+cache's own LRU drops them.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+SESSION_MEMORY_BUDGET = int(os.environ.get('AIRBNB_SESSION_MEMORY_MB', 32)) * 1024 * 1024
+SESSION_IDLE_SECONDS = int(os.environ.get('AIRBNB_SESSION_IDLE_SECONDS', 1800))
+
+
+class SessionLedger:
+    """Bytes of cached artefacts per session, with eviction over a budget."""
+
+    def __init__(self, budget, idle_seconds):
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        # session -> {'seen': time, 'items': OrderedDict of (cache, key) -> (page, bytes)}
+        self._sessions = {}
+        # (cache, key) -> sessions holding it
+        self._holders = {}
+        # cache name -> function removing a key from that cache
+        self._evictors = {}
+        self._lock = threading.Lock()
+
+    def register(self, cache, evict):
+        self._evictors[cache] = evict
+
+    def _session(self, session):
+        entry = self._sessions.setdefault(session, {'seen': 0, 'items': OrderedDict()})
+        entry['seen'] = time.monotonic()
+        return entry
+
+    def _drop(self, session, item):
+        # Called with the lock held; returns the item if no session holds it any more
+        self._sessions[session]['items'].pop(item, None)
+        holders = self._holders.get(item)
+        if holders is not None:
+            holders.discard(session)
+            if not holders:
+                del self._holders[item]
+                return item
+        return None
+
+    def _evict(self, released):
+        for cache, key in released:
+            evict = self._evictors.get(cache)
+            if evict is not None:
+                evict(key)
+
+    def charge(self, session, page, cache, key, size):
+        """Record that ``session`` uses ``key`` of ``cache``; returns how many artefacts were released."""
+        item = (cache, key)
+        released = []
+        with self._lock:
+            items = self._session(session)['items']
+            items[item] = (page, size)
+            items.move_to_end(item)
+            self._holders.setdefault(item, set()).add(session)
+
+            # Oldest first, never the artefact just used
+            total = sum(used for _, used in items.values())
+            for old in list(items):
+                if total <= self.budget or old == item:
+                    break
+                total -= items[old][1]
+                released.append(self._drop(session, old))
+        self._evict([item for item in released if item is not None])
+        return len(released)
+
+    def release(self, session, page=None):
+        """Stop charging ``session`` for its artefacts (only those of ``page`` if given).
+
+        The artefacts themselves stay in their caches.
+        """
+        with self._lock:
+            entry = self._sessions.get(session)
+            if entry is None:
+                return
+            for item, (item_page, _) in list(entry['items'].items()):
+                if page is None or item_page == page:
+                    self._drop(session, item)
+            if page is None:
+                del self._sessions[session]
+
+    def release_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [session for session, entry in self._sessions.items() if now - entry['seen'] > self.idle_seconds]
+        for session in idle:
+            self.release(session)
+
+    def usage(self, session):
+        with self._lock:
+            entry = self._sessions.get(session)
+            return sum(size for _, size in entry['items'].values()) if entry else 0
+
+    def sessions(self):
+        """``(session, artefacts, bytes, idle seconds)`` for each session with artefacts."""
+        now = time.monotonic()
+        with self._lock:
+            return [(session, len(entry['items']), sum(size for _, size in entry['items'].values()), round(now - entry['seen']))
+                    for session, entry in self._sessions.items()]
+
+
+ledger = SessionLedger(SESSION_MEMORY_BUDGET, SESSION_IDLE_SECONDS)
+
+# Shared cache name -> function returning its size in bytes
+_caches = {}
+
+
+def _array_bytes(values, seen):
+    # (private, mapped): arrays lying in a memory-mapped dataset file are mapped.
+    # Each block of memory is counted once, however many arrays view it.
+    import airbnb_data
+
+    values = np.asarray(values)
+    block = ('data', values.__array_interface__['data'][0], values.nbytes)
+    if block in seen:
+        return 0, 0
+    seen[block] = values
+    return (0, values.nbytes) if airbnb_data.is_mapped(values) else (values.nbytes, 0)
+
+
+def value_bytes(value, _seen=None, _depth=0):
+    """``(private, mapped)`` bytes held by ``value``, following containers and attributes.
+
+    Categorical columns count their codes only; the shared dimension tables
+    are reported once, on their own. Pass the same ``_seen`` dict to several
+    calls to count what they share only once.
+    """
+    import pandas as pd
+
+    # id -> object; holding the objects keeps their ids from being reused meanwhile
+    seen = {} if _seen is None else _seen
+    if id(value) in seen or _depth > 6:
+        return 0, 0
+    seen[id(value)] = value
+
+    if isinstance(value, pd.DataFrame):
+        totals = [value_bytes(value[column], seen, _depth + 1) for column in value.columns]
+        totals.append((value.index.memory_usage(deep=True), 0))
+        return tuple(map(sum, zip(*totals)))
+    if isinstance(value, pd.Series):
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            return _array_bytes(value.cat.codes.to_numpy(), seen)
+        if value.dtype == object:
+            return value.memory_usage(deep=True, index=False), 0
+        return _array_bytes(value.to_numpy(), seen)
+    if isinstance(value, pd.Index):
+        return value.memory_usage(deep=True), 0
+    if isinstance(value, np.ndarray):
+        return _array_bytes(value, seen)
+    if isinstance(value, (bytes, str)):
+        return sys.getsizeof(value), 0
+    if isinstance(value, dict):
+        children = list(value.values())
+    elif isinstance(value, (list, tuple, set)):
+        children = list(value)
+    elif hasattr(value, '__dict__'):
+        children = list(vars(value).values())
+    else:
+        return sys.getsizeof(value), 0
+
+    totals = [value_bytes(child, seen, _depth + 1) for child in children]
+    return tuple(map(sum, zip(*totals))) if totals else (0, 0)
+
+
+def memory_report():
+    """One row per dataset frame, derived value, dimension table, shared cache and session."""
+    import airbnb_data
+
+    # Datasets come first, so a derived value holding a loaded frame (like the
+    # filter index) only counts what it adds
+    rows = []
+    seen = {}
+    for name, key, value in airbnb_data.cached_items():
+        private, mapped = value_bytes(value, seen)
+        rows.append({'item': f'{name}: {key or "data"}', 'kind': 'dataset' if key is None else 'aggregate',
+                     'private_bytes': private, 'mapped_bytes': mapped})
+    for column, table in airbnb_data.dimension_tables().items():
+        rows.append({'item': f'{column} values', 'kind': 'dimension', 'private_bytes': table.memory_usage(deep=True), 'mapped_bytes': 0})
+    for name, cache in list(_caches.items()):
+        rows.append({'item': name, 'kind': 'cache', 'private_bytes': cache(), 'mapped_bytes': 0})
+    for session, artefacts, size, idle in ledger.sessions():
+        rows.append({'item': f'session {session} ({artefacts} artefacts, idle {idle}s)', 'kind': 'session',
+                     'private_bytes': size, 'mapped_bytes': 0})
+    return rows
+
+
+def register_cache(name, size, evict):
+    """Report cache ``name`` in ``memory_report`` and let the ledger evict from it."""
+    _caches[name] = size
+    ledger.register(name, evict)
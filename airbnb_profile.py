@@ -0,0 +1,88 @@
+"""Opt-in timing of the phases a page goes through.
+
+Each phase records wall time, the rows it processed and the memory it
+allocated (from tracemalloc, traced only while a phase runs), and is
+appended as one JSON line to ``AIRBNB_PROFILE_LOG`` for offline analysis.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_LOG = os.environ.get('AIRBNB_PROFILE_LOG', 'airbnb_profile.jsonl')
+
+_log_lock = threading.Lock()
+
+# tracemalloc is process-wide and slows every allocation, so it runs only
+# while some session is inside a profiled phase. _tracing_started is False
+# when something else (say the benchmark) turned it on and should stop it.
+_tracing_lock = threading.Lock()
+_active_phases = 0
+_tracing_started = False
+
+
+def _begin_tracing():
+    global _active_phases, _tracing_started
+    with _tracing_lock:
+        if _active_phases == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        if _active_phases == 0 and _tracing_started:
+            # Only the first of overlapping phases resets the peak; the others
+            # report the peak since it started rather than clobbering it
+            tracemalloc.reset_peak()
+        _active_phases += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _end_tracing():
+    global _active_phases, _tracing_started
+    with _tracing_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        _active_phases -= 1
+        if _active_phases == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+        return current, peak
+
+
+class PageProfile:
+    """Phases recorded during one run of a page."""
+
+    def __init__(self, page, session, log_path=PROFILE_LOG):
+        self.page = page
+        self.session = session
+        self.log_path = log_path
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, detail=''):
+        """Time the enclosed block; set ``record['rows']`` inside it to log rows processed."""
+        record = {'page': self.page, 'phase': name, 'detail': detail, 'rows': None}
+
+        # With several sessions profiling at once the allocation figures
+        # include whatever ran concurrently
+        allocated_before = _begin_tracing()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            current, peak = _end_tracing()
+            record['seconds'] = round(time.perf_counter() - started, 6)
+            record['allocated_bytes'] = current - allocated_before
+            record['peak_bytes'] = peak - allocated_before
+            record['session'] = self.session
+            record['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+            self.phases.append(record)
+            self._write(record)
+
+    def _write(self, record):
+        if not self.log_path:
+            return
+        with _log_lock:
+            with open(self.log_path, 'a') as log:
+                log.write(json.dumps(record) + '\n')
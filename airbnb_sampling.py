@@ -0,0 +1,125 @@
+"""Level-of-detail sampling for views with more points than are worth drawing.
+
+Above a point budget the map markers and the host scatter show a stratified
+sample instead of every row: the budget is shared out over Country, City and
+Room type in proportion to their sizes, so small markets keep their points.
+Within a stratum each row's place in line is a hash of its index label, so
+the sample is a fixed reservoir per listing: reruns give the same points and
+a narrower view keeps the points it had in the wider one. Samples are cached
+per filter state.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from airbnb_memory import register_cache
+
+STRATA = ['Country', 'City', 'Room type']
+
+# Filter states whose samples are kept, across sessions
+SAMPLE_CACHE_SIZE = 64
+
+
+def _quotas(sizes, budget, ties):
+    # Proportional allocation, with the rows left over from rounding down
+    # going to the strata that lost the largest fractions. Equal fractions
+    # (say strata of one row each, which all round down to nothing) are
+    # settled by ``ties``, a hash per stratum, not by the strata's order.
+    ideal = sizes * budget / sizes.sum()
+    quotas = np.floor(ideal).astype(np.int64)
+    leftover = int(budget - quotas.sum())
+    if leftover > 0:
+        quotas[np.lexsort((ties, quotas - ideal))[:leftover]] += 1
+    return np.minimum(quotas, sizes)
+
+
+def stratified_sample(df, budget, strata=STRATA):
+    """At most ``budget`` rows of ``df``, spread over ``strata`` by their sizes."""
+    if len(df) <= budget:
+        return df
+
+    strata = [column for column in strata if column in df.columns]
+    if strata:
+        groups = df.groupby(strata, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    else:
+        groups = np.zeros(len(df), dtype=np.int64)
+    sizes = np.bincount(groups)
+
+    # Rank rows within their stratum by the hash of their label; the lowest ranks are kept
+    keys = pd.util.hash_array(df.index.to_numpy())
+    order = np.lexsort((keys, groups))
+    ordered_groups = groups[order]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    quotas = _quotas(sizes, int(budget), keys[order[starts]])
+    rank = np.arange(len(order)) - starts[ordered_groups]
+    keep = np.sort(order[rank < quotas[ordered_groups]])
+    return df.iloc[keep]
+
+
+def sample_bytes(cached):
+    return int(cached[0].memory_usage(deep=True).sum())
+
+
+class SampleCache:
+    """LRU cache of ``(sample, total rows)`` per view and filter state."""
+
+    def __init__(self, size):
+        self.size = size
+        self.bytes = 0
+        self._samples = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is not None:
+                self._samples.move_to_end(key)
+            return sample
+
+    def put(self, key, sample):
+        with self._lock:
+            if key in self._samples:
+                self.bytes -= sample_bytes(self._samples.pop(key))
+            self._samples[key] = sample
+            self.bytes += sample_bytes(sample)
+            while len(self._samples) > self.size:
+                _, evicted = self._samples.popitem(last=False)
+                self.bytes -= sample_bytes(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            sample = self._samples.pop(key, None)
+            if sample is not None:
+                self.bytes -= sample_bytes(sample)
+
+
+sample_cache = SampleCache(SAMPLE_CACHE_SIZE)
+register_cache('sample', lambda: sample_cache.bytes, sample_cache.discard)
+
+
+def sampled_view(key, rows, budget, strata=STRATA):
+    """``(sample, total)`` for the frame built by ``rows()``, cached under ``key``.
+
+    ``key`` must identify the data version, every filter that ``rows``
+    applies and the budget; on a hit neither the filtering nor the sampling
+    is repeated.
+    """
+    cached = sample_cache.get(key)
+    if cached is not None:
+        return cached
+
+    df = rows()
+    cached = (stratified_sample(df, budget, strata), len(df))
+    sample_cache.put(key, cached)
+    return cached
+
+
+def sampling_note(shown, total, where, strata=STRATA):
+    """Caption text saying that a view is sampled, and at what rate."""
+    names = [column.lower() for column in strata]
+    described = ' and '.join([', '.join(names[:-1]), names[-1]] if len(names) > 1 else names)
+    return (f"Sampled view: {shown:,} of {total:,} {where} ({shown / total:.1%}), "
+            f"stratified by {described}.")
@@ -0,0 +1,69 @@
+"""Optional background warm-up of every page's base aggregates.
+
+With ``AIRBNB_WARMUP=1`` the first run of the app in a process starts a
+small thread pool that builds the Price cube, the correlation matrices, the
+Availability city sums, the Superhost tables and the Geospatial index. The
+pages keep calling the usual accessors: anything already built is returned
+at once, and an item still being built makes its page wait for that build
+(through ``cached_derived``'s per-key lock) rather than start another one.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WARMUP_ENABLED = os.environ.get('AIRBNB_WARMUP') == '1'
+WARMUP_WORKERS = int(os.environ.get('AIRBNB_WARMUP_WORKERS', 4))
+
+_lock = threading.Lock()
+_pool = None
+_tasks = {}
+
+
+def _tasks_to_warm():
+    # Imported here so the app does not pull in pandas before a page needs it
+    from airbnb_aggregates import city_availability, correlation_stats, host_insights, price_cube
+    from airbnb_index import filter_index, heat_pyramid
+
+    return {
+        'Price cube': price_cube,
+        'Correlation matrices': correlation_stats,
+        'Availability by city': city_availability,
+        'Superhost by country and city': host_insights,
+        'Geospatial index': filter_index,
+        'Map heat pyramid': heat_pyramid,
+    }
+
+
+def _run(name, build):
+    task = _tasks[name]
+    task['state'] = 'running'
+    started = time.perf_counter()
+    try:
+        build()
+    except Exception as error:
+        # The page will hit the same error and report it; warm-up just moves on
+        task['state'] = 'failed'
+        task['error'] = str(error)
+    else:
+        task['state'] = 'done'
+    task['seconds'] = round(time.perf_counter() - started, 3)
+
+
+def start_warmup(workers=WARMUP_WORKERS):
+    """Queue every aggregate once per process; later calls do nothing."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            return
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='airbnb-warmup')
+        for name, build in _tasks_to_warm().items():
+            _tasks[name] = {'state': 'pending', 'seconds': None, 'error': None}
+            _pool.submit(_run, name, build)
+        _pool.shutdown(wait=False)
+
+
+def warmup_status():
+    """``(name, state, seconds)`` for each queued item, in queue order."""
+    return [(name, task['state'], task['seconds']) for name, task in list(_tasks.items())]
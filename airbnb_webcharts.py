@@ -0,0 +1,117 @@
+"""Plotly versions of the pricing, neighbourhood and host charts.
+
+Each builder takes the same arguments as its namesake in ``airbnb_charts``
+and returns a Plotly figure with the same colours and labels. The page sends
+only the chart's table to the browser, which draws it, instead of a PNG
+rasterised on the server. The scatter uses a WebGL trace.
+"""
+
+import plotly.graph_objects as go
+
+from airbnb_aggregates import price_ci95
+# availability_bars is already drawn by Plotly; it is imported so both modules offer every builder.
+# Nothing here imports airbnb_charts, so this backend never loads matplotlib or seaborn.
+from airbnb_chart_common import PRICE_STATISTICS, SUPERHOST_COLORS, availability_bars, plain  # noqa: F401
+from airbnb_chart_common import listings_scatter as _listings_scatter
+from airbnb_chart_common import price_chart as _price_chart
+
+# The colours of the matplotlib charts
+BAR_COLOR = '#FF5A5F'
+EDGE_COLOR = '#424242'
+
+# Pixels per inch of the matplotlib figure sizes
+PIXELS_PER_INCH = 40
+
+
+def _layout(fig, title, xlabel, ylabel, height=None, tickangle=-45):
+    fig.update_layout(title=title, xaxis_title=xlabel, yaxis_title=ylabel, height=height, showlegend=len(fig.data) > 1)
+    fig.update_xaxes(tickangle=tickangle)
+    return fig
+
+
+def _height(rows, per_row=0.45, base=1.5):
+    return int((base + per_row * max(rows, 1)) * PIXELS_PER_INCH)
+
+
+def country_price_bars(mean_prices, title, price_label=None):
+
+    mean_prices = plain(mean_prices)
+    fig = go.Figure(go.Bar(x=mean_prices['Country'], y=mean_prices['Price'], marker_color=BAR_COLOR))
+    return _layout(fig, title, "Country", price_label or "Average Price")
+
+
+def type_price_bars(summary, x, xlabel, title, price_label=None):
+
+    summary = plain(summary)
+    # The intervals are for the mean; quantile bars are drawn without them
+    error = None if price_label is not None else dict(type='data', array=price_ci95(summary), color=EDGE_COLOR)
+    fig = go.Figure(go.Bar(x=summary[x], y=summary['Price'], error_y=error, marker_color=BAR_COLOR))
+    return _layout(fig, title, xlabel, price_label or "Price")
+
+
+def suburb_price_bars(mean_suburb_prices, city, country, price_label=None):
+
+    mean_suburb_prices = plain(mean_suburb_prices)
+    fig = go.Figure(go.Bar(x=mean_suburb_prices['Price'], y=mean_suburb_prices['Suburb'], orientation='h',
+                           marker_color=BAR_COLOR, text=mean_suburb_prices['Price'], texttemplate='%{text:.2f}',
+                           textposition='outside'))
+    fig = _layout(fig, f"{price_label or 'Average Price'} of Suburbs in {city}({country})", price_label or "Average Price",
+                  "Suburbs", _height(len(mean_suburb_prices)), tickangle=0)
+    # First row at the top, as in the bar chart it replaces
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
+def price_box_plot(summary, x, title, horizontal=False):
+
+    # Boxes from the sketch quantiles: p25-p75 with the median, whiskers at p10 and p90
+    summary = plain(summary)
+    labels = summary[x].astype(str)
+    box = dict(q1=summary['p25'], median=summary['Median'], q3=summary['p75'], lowerfence=summary['p10'],
+               upperfence=summary['p90'], fillcolor=BAR_COLOR, line_color=EDGE_COLOR)
+    if horizontal:
+        fig = go.Figure(go.Box(y=labels, orientation='h', **box))
+        fig = _layout(fig, title, "Price", None, _height(len(summary)), tickangle=0)
+        fig.update_yaxes(autorange='reversed')
+    else:
+        fig = _layout(go.Figure(go.Box(x=labels, **box)), title, None, "Price")
+    return fig
+
+
+def price_chart(summary, statistic, x, title, bars, horizontal=False):
+    """``bars(data, price_label)`` over the chosen statistic, or a box plot for 'Distribution'."""
+    return _price_chart(summary, statistic, x, title, bars, price_box_plot, horizontal)
+
+
+def superhost_status_bars(counts, x, title, figsize):
+
+    counts = plain(counts)
+    fig = go.Figure()
+    for status, group in counts.groupby('Super host', sort=False):
+        fig.add_trace(go.Bar(x=group[x], y=group['Count'], name=status, marker_color=SUPERHOST_COLORS.get(status),
+                             text=group['Count'], textposition='outside'))
+    fig.update_layout(barmode='group', legend_title='Super host')
+    return _layout(fig, title, x, "Count", figsize[1] * PIXELS_PER_INCH, tickangle=-90)
+
+
+def average_price_bars(avg_price, x, title, figsize, tick_size, price_label=None):
+
+    avg_price = plain(avg_price)
+    fig = go.Figure(go.Bar(x=avg_price[x], y=avg_price['Price'], marker_color=BAR_COLOR,
+                           text=avg_price['Price'], textposition='outside'))
+    fig = _layout(fig, title, x, price_label or "Average Price", figsize[1] * PIXELS_PER_INCH, tickangle=-90)
+    fig.update_xaxes(tickfont_size=tick_size)
+    return fig
+
+
+def city_listing_bars(city_data, x, xlabel, title):
+
+    city_data = plain(city_data)
+    fig = go.Figure(go.Bar(x=city_data[x], y=city_data['City'], orientation='h', marker_color=BAR_COLOR))
+    fig = _layout(fig, title, xlabel, "City", _height(len(city_data), per_row=0.6), tickangle=0)
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
+def listings_scatter(merged_data):
+    return _listings_scatter(merged_data, render_mode='webgl')
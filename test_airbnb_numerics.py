@@ -0,0 +1,182 @@
+"""Checks of the incremental and sketched aggregates against plain pandas and numpy.
+
+Run with ``python -m pytest``. The data is the benchmark's synthetic datasets
+(``airbnb_benchmark.generate``), written to a temporary directory.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import airbnb_aggregates
+import airbnb_benchmark
+import airbnb_data
+import airbnb_index
+from airbnb_aggregates import CORRELATION_COLUMNS, QUANTILES, SKETCH_ACCURACY, CovarianceAccumulator, QuantileSketch
+
+ROWS = 20_000
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('generated')
+    airbnb_benchmark.generate(str(directory), ROWS, seed=1)
+    return directory
+
+
+@pytest.fixture
+def data_dir(generated, tmp_path):
+    # A fresh copy per test, so appends and edits do not leak between tests
+    directory = tmp_path / 'data'
+    shutil.copytree(generated, directory)
+    saved = airbnb_data.DATA_DIR, airbnb_data.CACHE_DIR
+    airbnb_data.DATA_DIR, airbnb_data.CACHE_DIR = str(directory), str(directory / '.cache')
+    airbnb_data.clear_cache()
+    yield directory
+    airbnb_data.DATA_DIR, airbnb_data.CACHE_DIR = saved
+    airbnb_data.clear_cache()
+
+
+def _numeric(df, columns):
+    return df[columns].apply(pd.to_numeric, errors='coerce').astype(float)
+
+
+def test_correlation_merge_matches_pandas(data_dir):
+    df = pd.read_csv(airbnb_data.csv_path('Corelation'))
+    df.columns = df.columns.str.strip()
+    expected = _numeric(df, CORRELATION_COLUMNS).corr()
+
+    # Uneven chunks merged together, as the chunked build and appends do
+    accumulator = CovarianceAccumulator(CORRELATION_COLUMNS)
+    for chunk in np.split(np.arange(len(df)), [7, 5_000, 12_345]):
+        accumulator.merge(CovarianceAccumulator.from_frame(df.iloc[chunk], CORRELATION_COLUMNS))
+
+    pd.testing.assert_frame_equal(accumulator.corr(CORRELATION_COLUMNS), expected, atol=1e-9)
+    pd.testing.assert_frame_equal(airbnb_aggregates.correlation_stats().corr(CORRELATION_COLUMNS), expected, atol=1e-9)
+
+
+def test_sketch_quantiles_match_numpy(data_dir):
+    df = airbnb_data.load_dataset('Price')
+    sketch = QuantileSketch(df, ['Country', 'City', 'Suburb'])
+
+    for by in (['Country'], ['Country', 'City'], ['Country', 'City', 'Suburb']):
+        estimated = sketch.quantiles(by).set_index(by)
+        grouped = df.dropna(subset=by + ['Price']).groupby(by, observed=True)['Price']
+        for name, quantile in QUANTILES.items():
+            exact = grouped.quantile(quantile)
+            error = (estimated[name].reindex(exact.index) - exact).abs() / exact
+            assert error.max() <= SKETCH_ACCURACY + 1e-9, (by, name)
+
+
+def test_sketch_quantiles_interpolate_small_groups():
+    df = pd.DataFrame({'City': ['a', 'a', 'b'], 'Price': [100.0, 500.0, 70.0]})
+    estimated = QuantileSketch(df, ['City']).quantiles(['City']).set_index('City')
+
+    for name, quantile in QUANTILES.items():
+        assert estimated.loc['a', name] == pytest.approx(np.quantile([100, 500], quantile), rel=SKETCH_ACCURACY)
+        assert estimated.loc['b', name] == pytest.approx(70, rel=SKETCH_ACCURACY)
+
+
+def test_filter_index_rows_match_masks(data_dir):
+    df = airbnb_data.load_dataset('Geospatial')
+    index = airbnb_index.FilterIndex(df)
+    rng = np.random.default_rng(0)
+
+    for _ in range(25):
+        countries = list(rng.choice(index.countries, rng.integers(0, 4), replace=False))
+        room_types = list(rng.choice(index.room_types, rng.integers(0, 3), replace=False))
+        price = tuple(sorted(rng.uniform(*index.price_bounds, 2)))
+        rating = tuple(sorted(rng.uniform(*index.rating_bounds, 2)))
+        low = rng.uniform(-40, 50), rng.uniform(-120, 140)
+        bounds = (low, (low[0] + rng.uniform(1, 30), low[1] + rng.uniform(1, 60))) if rng.random() < 0.5 else None
+
+        mask = (df['Country'].isin(countries) & df['Price'].between(*price) & df['Rating'].between(*rating)).to_numpy()
+        if room_types:
+            mask &= df['Room type'].isin(room_types).to_numpy()
+        if bounds is not None:
+            (first_low, second_low), (first_high, second_high) = bounds
+            mask &= (df['Longitude'].between(first_low, first_high) & df['Latitude'].between(second_low, second_high)).to_numpy()
+
+        np.testing.assert_array_equal(index.rows(countries, room_types, price, rating, bounds), np.flatnonzero(mask))
+
+
+def _snapshot():
+    cube = airbnb_aggregates.price_cube()
+    values = {
+        'Price': airbnb_data.load_dataset('Price'),
+        'Superhost': airbnb_data.load_dataset('Superhost'),
+        'prices': cube.rollup(['Country', 'Room type'], sort=True),
+        'quantiles': cube.quantiles(['Country']),
+        'availability': airbnb_aggregates.city_availability(),
+        'correlation': airbnb_aggregates.correlation_stats().corr(CORRELATION_COLUMNS),
+    }
+    insights = airbnb_aggregates.host_insights()
+    values.update({name: table for name, table in insights.tables.items() if name != 'rows'})
+    return values
+
+
+def _plain(df):
+    df = df.reset_index(drop=True)
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def _assert_same(first, second):
+    assert first.keys() == second.keys()
+    for name in first:
+        pd.testing.assert_frame_equal(_plain(first[name]), _plain(second[name]), check_dtype=False, rtol=1e-9, obj=name)
+
+
+def _append(name, rows):
+    path = airbnb_data.csv_path(name)
+    extra = pd.read_csv(path, nrows=rows)
+    # A city no earlier row has, so the shared dimensions grow too
+    if 'City' in extra:
+        extra.loc[0, 'City'] = 'Appended city'
+    with open(path, 'a') as handle:
+        extra.to_csv(handle, header=False, index=False)
+
+
+def _bump_mtime(name):
+    # Same-size rewrites within the clock's resolution would keep the signature
+    path = airbnb_data.csv_path(name)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_append_matches_full_reload(data_dir, monkeypatch):
+    _snapshot()
+    for name in ('Price', 'Availability', 'Corelation', 'Superhost'):
+        _append(name, 50)
+        _bump_mtime(name)
+
+    # Every aggregate is folded in from the appended rows, not rebuilt
+    monkeypatch.setattr(airbnb_data, '_load_full', lambda *args: pytest.fail('full reload after an append'))
+    incremental = _snapshot()
+    monkeypatch.undo()
+
+    airbnb_data.clear_cache()
+    _assert_same(incremental, _snapshot())
+
+
+def test_edited_rows_force_a_full_reload(data_dir):
+    _snapshot()
+    path = airbnb_data.csv_path('Price')
+    since = airbnb_data.source_signature('Price')
+
+    # Change one digit of a price in the middle of the file, keeping its size, then append
+    content = bytearray(open(path, 'rb').read())
+    middle = content.index(b'\n', len(content) // 2) + 1
+    digit = next(position for position in range(middle, len(content)) if chr(content[position]).isdigit())
+    content[digit] = ord('1') if content[digit] != ord('1') else ord('2')
+    with open(path, 'wb') as handle:
+        handle.write(bytes(content))
+    _append('Price', 50)
+    _bump_mtime('Price')
+
+    assert airbnb_data.appended_rows('Price', since, airbnb_data.source_signature('Price')) is None
+    after_edit = _snapshot()
+    airbnb_data.clear_cache()
+    _assert_same(after_edit, _snapshot())